@@ -5,6 +5,7 @@ from jose import JWTError, jwt
 from sqlalchemy.orm import Session
 from config.config import SECRET_KEY, ALGORITHM
 import crud.user as _crud_user
+import crud.lookup as _crud_lookup
 import schemas.user as _schemas
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
@@ -22,6 +23,14 @@ def _add_tables():
     _database.Base.metadata.create_all(bind=_database.engine)
 
 
+async def _warm_lookups():
+    db = _database.SessionLocal()
+    try:
+        await _crud_lookup.warm_lookups(db)
+    finally:
+        db.close()
+
+
 async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)) -> _schemas.User:
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
@@ -0,0 +1,114 @@
+from fastapi import HTTPException
+from sqlalchemy.orm import Session
+from typing import List, Dict, Any
+import models.blocking_index as _models
+import models.project as _models_project
+import models.appended_record as _models_appended_record
+from crud.project import get_master_content
+from pipeline.BlockingIndex import BlockingIndex
+import datetime as _dt
+import pandas as pd
+import json
+
+
+async def build_blocking_index(db: Session, project: _models_project.Project,
+                               columns: List[str]) -> _models.BlockingIndex:
+    content = get_master_content(project) or []
+    data = pd.DataFrame(content)
+    _check_columns(data, columns)
+
+    keys = BlockingIndex(columns).block_keys(data)
+
+    if project.blocking_index is not None:
+        db.delete(project.blocking_index)
+        db.flush()
+
+    blocking_index = _models.BlockingIndex(
+        columns=columns,
+        num_records=len(data),
+        project_id=project.id,
+        date_created=_dt.datetime.utcnow(),
+        date_updated=_dt.datetime.utcnow()
+    )
+    # One posting per record ID, with the key of its first record.
+    postings = {}
+    for record, key in zip(content, keys):
+        postings.setdefault(_record_key(record.get('ID')), key)
+    blocking_index.records = [
+        _models.BlockingIndexRecord(key=key, record_id=record_id) for record_id, key in postings.items()
+    ]
+
+    db.add(blocking_index)
+    db.commit()
+    db.refresh(blocking_index)
+
+    return blocking_index
+
+
+async def add_records(db: Session, project: _models_project.Project, records: List[Dict[str, Any]]) -> dict:
+    blocking_index = project.blocking_index
+    if blocking_index is None:
+        raise HTTPException(status_code=404, detail="Blocking index not found")
+
+    if not records:
+        raise HTTPException(status_code=400, detail={"message": "No records were provided."})
+    if any('ID' not in record for record in records):
+        raise HTTPException(status_code=400, detail={"message": "Every record must have an 'ID'."})
+
+    # The index keeps the IDs of its records, so only the new IDs are looked up.
+    new_ids = [_record_key(record['ID']) for record in records]
+    clashing = db.query(_models.BlockingIndexRecord.id).filter(
+        _models.BlockingIndexRecord.blocking_index_id == blocking_index.id,
+        _models.BlockingIndexRecord.record_id.in_(new_ids)
+    ).first()
+    if len(set(new_ids)) != len(new_ids) or clashing is not None:
+        raise HTTPException(status_code=400, detail={"message": "Record IDs must be unique within the project."})
+
+    data = pd.DataFrame(records)
+    _check_columns(data, blocking_index.columns)
+
+    # Only the postings of keys present in the new records are read, and only
+    # the new records' postings are written.
+    index = BlockingIndex(blocking_index.columns)
+    keys = index.block_keys(data)
+    postings = db.query(_models.BlockingIndexRecord.key, _models.BlockingIndexRecord.record_id).filter(
+        _models.BlockingIndexRecord.blocking_index_id == blocking_index.id,
+        _models.BlockingIndexRecord.key.in_(keys.unique().tolist())
+    ).order_by(_models.BlockingIndexRecord.id).all()
+    for key, record_id in postings:
+        index.buckets.setdefault(key, []).append(json.loads(record_id))
+
+    new_pairs = index.add_records(data)
+
+    # New records are stored as rows of their own; the project's file is
+    # never rewritten.
+    db.add_all([_models.BlockingIndexRecord(key=key, record_id=record_id, blocking_index_id=blocking_index.id)
+                for key, record_id in zip(keys, new_ids)])
+    db.add_all([_models_appended_record.AppendedRecord(record=record, project_id=project.id) for record in records])
+
+    blocking_index.num_records += len(records)
+    blocking_index.date_updated = _dt.datetime.utcnow()
+    project.date_updated = _dt.datetime.utcnow()
+
+    db.commit()
+
+    return {
+        "num_pairs": len(new_pairs),
+        "pairs": new_pairs.to_dict(orient="records"),
+    }
+
+
+def _record_key(record_id: Any) -> str:
+    # JSON keeps 1 and "1" apart, as the records themselves do.
+    return json.dumps(record_id)
+
+
+def _check_columns(data: pd.DataFrame, columns: List[str]):
+    missing_columns = [col for col in columns if col not in data.columns]
+    if not columns or missing_columns:
+        raise HTTPException(
+            status_code=400,
+            detail={"message": f"Columns not found in the data: {', '.join(missing_columns) or 'none selected'}."}
+        )
+    if 'ID' not in data.columns:
+        raise HTTPException(status_code=400, detail={"message": "Records must have an 'ID' column."})
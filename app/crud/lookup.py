@@ -0,0 +1,61 @@
+from fastapi import HTTPException
+from sqlalchemy.orm import Session
+from typing import Dict, Any
+import models.workflow as _models
+from models.enums.step_name import StepName
+from crud.workflow import get_workflow, get_workflow_by_id
+from crud.step_executor import build_record_lookup
+from pipeline.RecordLookup import RecordLookup
+
+# In-memory lookup indexes, one per workflow, kept for the process lifetime.
+_lookups: Dict[int, RecordLookup] = {}
+
+
+async def refresh_lookup(db: Session, workflow_id: int) -> RecordLookup | None:
+    _lookups.pop(workflow_id, None)
+
+    workflow = await get_workflow_by_id(db, workflow_id)
+    if workflow is None or not workflow.blocked_data:
+        return None
+
+    steps = {step.name: step.parameters for step in workflow.workflow_steps}
+    if StepName.BLOCK_BUILDING not in steps or StepName.FIELD_AND_RECORD_COMPARISON not in steps:
+        return None
+
+    _lookups[workflow_id] = build_record_lookup(workflow.blocked_data, steps)
+    return _lookups[workflow_id]
+
+
+async def try_refresh_lookup(db: Session, workflow_id: int) -> RecordLookup | None:
+    # The lookup cache only speeds lookups up; a workflow whose index cannot
+    # be built is left out and rebuilt on its next lookup instead of failing
+    # startup or a step that was already saved.
+    try:
+        return await refresh_lookup(db, workflow_id)
+    except Exception as e:
+        print(f"Error building lookup index for workflow {workflow_id}: {e}")
+        return None
+
+
+async def warm_lookups(db: Session):
+    workflow_ids = db.query(_models.Workflow.id).filter(_models.Workflow.blocked_data.isnot(None)).all()
+    for (workflow_id,) in workflow_ids:
+        await try_refresh_lookup(db, workflow_id)
+
+
+async def lookup_record(db: Session, workflow_id: int, user_id: int, record: Dict[str, Any], top_n: int):
+    await get_workflow(workflow_id=workflow_id, db=db, user_id=user_id)
+
+    lookup = _lookups.get(workflow_id)
+    if lookup is None:
+        try:
+            lookup = await refresh_lookup(db, workflow_id)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail={"message": str(e)})
+    if lookup is None:
+        raise HTTPException(
+            status_code=400,
+            detail={"message": "The workflow needs saved block building and comparison steps for lookups."}
+        )
+
+    return {"matches": lookup.lookup(record, top_n=top_n)}
@@ -3,9 +3,11 @@ import json
 import csv
 from fastapi import HTTPException, UploadFile
 from sqlalchemy.orm import Session
-from typing import List
+from typing import List, Dict, Any
 import models.project as _models
+import models.linked_dataset as _models_linked_dataset
 import schemas.project as _schemas
+from pipeline.CandidatePairs import SOURCE_COLUMN, SOURCE_ID_COLUMN
 import datetime as _dt
 
 
@@ -93,11 +95,80 @@ async def _process_file(file: UploadFile) -> tuple:
     return file_content, file.filename
 
 
-async def update_project(db: Session, project: _models.Project, project_dto: _schemas.ProjectCreate) -> _models.Project:
+async def set_linked_dataset(db: Session, project: _models.Project,
+                             file: UploadFile) -> _models_linked_dataset.LinkedDataset:
+    file_content, filename = await _process_file(file)
+
+    if project.linked_dataset is not None:
+        db.delete(project.linked_dataset)
+        db.flush()
+
+    linked_dataset = _models_linked_dataset.LinkedDataset(
+        filename=filename,
+        file_content=file_content,
+        project_id=project.id,
+        date_created=_dt.datetime.utcnow()
+    )
+
+    db.add(linked_dataset)
+    db.commit()
+    db.refresh(project)
+
+    return linked_dataset
+
+
+async def delete_linked_dataset(db: Session, project: _models.Project):
+    if project.linked_dataset is None:
+        raise HTTPException(status_code=404, detail={"message": "The project has no linked dataset."})
+
+    db.delete(project.linked_dataset)
+    db.commit()
+    db.refresh(project)
+
+
+def get_master_content(project: _models.Project) -> List[Dict[str, Any]] | None:
+    # The uploaded file followed by the records appended through the blocking
+    # index, which are kept in their own table.
+    if not project.appended_records:
+        return project.file_content
+    return (project.file_content or []) + [appended.record for appended in project.appended_records]
+
+
+def get_project_content(project: _models.Project) -> List[Dict[str, Any]] | None:
+    # With a linked dataset the workflow runs on both files at once: each record
+    # is tagged with its source and renumbered, and the original ID is kept.
+    if project.linked_dataset is None:
+        return get_master_content(project)
+
+    records = []
+    for source, file_content in (('master', get_master_content(project)),
+                                 ('linked', project.linked_dataset.file_content)):
+        for record in file_content or []:
+            records.append({**record, 'ID': len(records) + 1, SOURCE_COLUMN: source,
+                            SOURCE_ID_COLUMN: record.get('ID')})
+    return records
+
+
+def get_source_column(project: _models.Project) -> str | None:
+    # Linkage mode is on only for projects with a linked dataset; the source
+    # tag is a reserved column that user data cannot collide with.
+    return SOURCE_COLUMN if project.linked_dataset is not None else None
+
+
+async def update_project(db: Session, project: _models.Project, project_dto: _schemas.ProjectCreate,
+                         file: UploadFile = None) -> _models.Project:
     project.title = project_dto.title
     project.description = project_dto.description
     project.date_updated = _dt.datetime.utcnow()
 
+    if file is not None:
+        project.file_content, project.filename = await _process_file(file)
+        # Appended records and the blocking index belong to the replaced data;
+        # the index has to be built again for the new file.
+        project.appended_records = []
+        if project.blocking_index is not None:
+            db.delete(project.blocking_index)
+
     db.commit()
     db.refresh(project)
 
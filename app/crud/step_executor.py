@@ -3,16 +3,18 @@ from typing import List, Dict, Any
 import pandas as pd
 from pipeline.DataPreprocessing import DataPreprocessing
 from pipeline.BlockBuilding import BlockBuilding
-from pipeline.Comparison import Comparison
+from pipeline.Comparison import Comparison, BatchComparator
+from pipeline.SimilarityCache import SimilarityCache
 from pipeline.Classifier import Classifier
+from pipeline.RecordLookup import RecordLookup
 
 
 async def execute(file_content: List[Dict], step: StepName, parameters: Dict[str, Any],
-                  block_building_data: List[Dict]):
+                  block_building_data: List[Dict], source_column: str | None = None):
     if step == StepName.DATA_PREPROCESSING:
         df = pd.DataFrame(file_content)
 
-        preprocessor = DataPreprocessing(df)
+        preprocessor = DataPreprocessing(df, source_column=source_column)
 
         preprocessor.select_columns(['all'])
 
@@ -29,111 +31,208 @@ async def execute(file_content: List[Dict], step: StepName, parameters: Dict[str
 
         return preprocessor.dataframe_to_jsonb()
     elif step == StepName.BLOCK_BUILDING:
-        df = pd.DataFrame(file_content)
-
-        algorithm = parameters.get("algorithm")
-        inputs = parameters.get("inputs", {})
-
-        window_size = inputs.get("windowSize", 5)
-        n_letters = inputs.get("nLetters", 3)
-        max_window_size = inputs.get("maxWindowSize", 10)
-        match_threshold = inputs.get("threshold", 0.8)
-
-        block_builder = BlockBuilding(df, algorithm)
-
-        if algorithm == "standardBlocking":
-            blocks = block_builder.build_blocks(columns=inputs.get("columns", []))
-        elif algorithm == "sortedNeighborhood":
-            blocks = block_builder.build_blocks(
-                columns=inputs.get("columns", []),
-                window_size=window_size,
-                n_letters=n_letters
-            )
-        elif algorithm == "dynamicSortedNeighborhood":
-            blocks = block_builder.build_blocks(
-                columns=inputs.get("columns", []),
-                max_window_size=max_window_size,
-                match_threshold=match_threshold,
-                n_letters=n_letters
-            )
-        else:
-            raise ValueError("Invalid blocking algorithm specified.")
+        block_builder = build_blocks(pd.DataFrame(file_content), parameters, source_column=source_column)
 
         return block_builder.dataframe_to_jsonb()
     elif step == StepName.FIELD_AND_RECORD_COMPARISON:
         df = pd.DataFrame(file_content)
 
-        selected_algorithms = parameters.get("selectedAlgorithms", {})
-        q_value = parameters.get("qValue", 2)
+        processes = parameters.get("processes")
 
-        comparison = Comparison(df)
+        cache_size = parameters.get("cacheSize", 100000)
+        comparison = Comparison(df, cache=SimilarityCache.shared(cache_size)) if cache_size \
+            else Comparison(df, cache_size=0)
 
-        column_algorithms = {}
-        for column, algo in selected_algorithms.items():
-            if column not in df.columns:
-                raise ValueError(f"Column '{column}' not found in the data.")
-            if algo == "Q-gram":
-                column_algorithms[column] = lambda str1, str2: comparison.qgram_similarity(str1, str2, q=q_value)
-            elif algo == "Levenshtein":
-                column_algorithms[column] = comparison.levenshtein_similarity
-            elif algo == "Jaro-Winkler":
-                column_algorithms[column] = comparison.jaro_winkler_similarity
-            else:
-                raise ValueError(f"Unsupported algorithm '{algo}' for column '{column}'.")
+        column_algorithms = _column_algorithms(df, comparison, parameters)
 
-        comparison_results = comparison.compare_within_blocks(column_algorithms)
+        comparison_results = comparison.compare_within_blocks(
+            column_algorithms,
+            processes=processes,
+            prune_threshold=parameters.get("pruneThreshold")
+        )
+        if comparison.cache is not None:
+            parameters["cacheStatistics"] = comparison.get_cache_statistics()
 
         return comparison.dataframe_to_jsonb()
     elif step == StepName.CLASSIFICATION:
         blocked_data = pd.DataFrame(block_building_data)
         comparison_table = pd.DataFrame(file_content)
 
-        classification_type = parameters.get("classificationType")
-
         classifier = Classifier(blocked_data=blocked_data, comparison_table=comparison_table)
 
-        if classification_type == "cost-based":
-            costs = {
-                "non_match_true_match": parameters.get("costTrueMatchAsNonMatch", 1),
-                "non_match_true_non_match": parameters.get("costTrueNonMatchAsNonMatch", 1),
-                "match_true_match": parameters.get("costTrueMatchAsMatch", 1),
-                "match_true_non_match": parameters.get("costTrueNonMatchAsMatch", 1.9)
-            }
-            probabilities = {
-                "M": parameters.get("probabilityM", 0.74),
-                "U": 1 - parameters.get("probabilityM", 0.74)
-            }
-
-            classification_results = classifier.classify_matches(
-                method="cost_based",
-                costs=costs,
-                probabilities=probabilities
-            )
-
-        elif classification_type == "weighted-threshold":
-            thresholds = {"match": parameters.get("thresholdMatch", 0.5)}
-            weights = parameters.get("columnWeights", {})
-
-            classification_results = classifier.classify_matches(
-                method="weighted",
-                thresholds=thresholds,
-                weights=weights
-            )
-
-        elif classification_type == "threshold":
-            thresholds = {
-                "match": parameters.get("thresholdMatch", 0.5),
-                "not_match": parameters.get("thresholdNotMatch", 0.3)
-            }
-            possible_match = parameters.get("possibleMatch", False)
-
-            classification_results = classifier.classify_matches(
-                method="threshold_based",
-                thresholds=thresholds,
-                possible_match=possible_match
-            )
+        classification_results = classifier.classify_matches(**_classification_options(parameters))
+        # Saved with the step so record lookups classify as this run did.
+        parameters["fittedState"] = classifier.fitted_state()
+
+        return classifier.dataframe_to_jsonb(detail_columns=parameters.get("detailColumns"))
+
+
+def build_record_lookup(file_content: List[Dict], steps: Dict[str, Dict[str, Any]]) -> RecordLookup:
+    df = pd.DataFrame(file_content)
+    df = df.drop(columns=[col for col in ("block_id", "BKV", "SKV", "candidates") if col in df.columns])
+
+    blocking_parameters = steps[StepName.BLOCK_BUILDING]
+    blocking = _blocking_pass(blocking_parameters)
+    if blocking["method"] == "multiPass":
+        blocking["passes"] = [
+            _blocking_pass(blocking_pass) for blocking_pass in blocking_parameters.get("inputs", {}).get("passes", [])
+        ]
+
+    preprocessing = None
+    if StepName.DATA_PREPROCESSING in steps:
+        preprocessing_parameters = steps[StepName.DATA_PREPROCESSING]
+        preprocessing = {
+            "lowercase": preprocessing_parameters.get("lowercase", False),
+            "diacritics_removal": preprocessing_parameters.get("removeDiacritics", False),
+            "punctuation_removal": preprocessing_parameters.get("removePunctuation", False),
+        }
+
+    classification = None
+    if StepName.CLASSIFICATION in steps:
+        classification = _classification_options(steps[StepName.CLASSIFICATION])
+        classification["state"] = steps[StepName.CLASSIFICATION].get("fittedState")
+
+    return RecordLookup(
+        df,
+        blocking=blocking,
+        column_algorithms=_column_algorithms(df, Comparison(df, cache_size=0),
+                                             steps[StepName.FIELD_AND_RECORD_COMPARISON]),
+        preprocessing=preprocessing,
+        classification=classification
+    )
+
+
+async def dry_run_blocking(file_content: List[Dict], blocking_parameters: Dict[str, Any],
+                           comparison_parameters: Dict[str, Any] = None, sample_size: int = 1000,
+                           source_column: str | None = None):
+    df = pd.DataFrame(file_content)
+    df = df.drop(columns=[col for col in ("block_id", "BKV", "SKV", "candidates") if col in df.columns])
+
+    block_builder = build_blocks(df, blocking_parameters, source_column=source_column)
+
+    column_algorithms = None
+    if comparison_parameters:
+        column_algorithms = _column_algorithms(df, Comparison(df, cache_size=0), comparison_parameters)
+
+    return block_builder.estimate_cost(column_algorithms, sample_size=sample_size)
+
+
+def build_blocks(df: pd.DataFrame, parameters: Dict[str, Any], source_column: str | None = None) -> BlockBuilding:
+    inputs = parameters.get("inputs", {})
+
+    # A single method takes the same options as one pass of multiPass.
+    options = _blocking_pass(parameters)
+    algorithm = options.pop("method")
+    if algorithm == "multiPass":
+        options = {
+            "passes": [_blocking_pass(blocking_pass) for blocking_pass in inputs.get("passes", [])],
+            "workers": inputs.get("workers", 1),
+        }
+
+    block_builder = BlockBuilding(df, algorithm, source_column=source_column)
+    block_builder.build_blocks(**options)
+
+    if any(inputs.get(key) for key in ("maxBlockSize", "maxBlockPairs", "dropEmptyKeys", "metaBlocking")):
+        block_builder.refine_blocks(
+            max_block_size=inputs.get("maxBlockSize"),
+            max_block_pairs=inputs.get("maxBlockPairs"),
+            oversized=inputs.get("oversizedBlocks", "purge"),
+            drop_empty_keys=inputs.get("dropEmptyKeys", False),
+            meta_blocking=inputs.get("metaBlocking"),
+            top_k=inputs.get("topK", 5)
+        )
+
+    return block_builder
 
-        else:
-            raise ValueError(f"Unsupported classification type: {classification_type}")
 
-        return classifier.dataframe_to_jsonb()
+def _column_algorithms(df: pd.DataFrame, comparison: Comparison, parameters: Dict[str, Any]) -> Dict[str, Any]:
+    selected_algorithms = parameters.get("selectedAlgorithms", {})
+    q_value = parameters.get("qValue", 2)
+    workers = parameters.get("workers", 1)
+
+    column_algorithms = {}
+    for column, algo in selected_algorithms.items():
+        if column not in df.columns:
+            raise ValueError(f"Column '{column}' not found in the data.")
+        if algo == "Q-gram":
+            column_algorithms[column] = BatchComparator(comparison.qgram_similarity_batch, q=q_value)
+        elif algo == "Levenshtein":
+            column_algorithms[column] = BatchComparator(comparison.levenshtein_similarity_batch, workers=workers)
+        elif algo == "Jaro-Winkler":
+            column_algorithms[column] = BatchComparator(comparison.jaro_winkler_similarity_batch, workers=workers)
+        else:
+            raise ValueError(f"Unsupported algorithm '{algo}' for column '{column}'.")
+    return column_algorithms
+
+
+def _classification_options(parameters: Dict[str, Any]) -> Dict[str, Any]:
+    classification_type = parameters.get("classificationType")
+
+    if classification_type == "cost-based":
+        costs = {
+            "non_match_true_match": parameters.get("costTrueMatchAsNonMatch", 1),
+            "non_match_true_non_match": parameters.get("costTrueNonMatchAsNonMatch", 1),
+            "match_true_match": parameters.get("costTrueMatchAsMatch", 1),
+            "match_true_non_match": parameters.get("costTrueNonMatchAsMatch", 1.9)
+        }
+        probabilities = {
+            "M": parameters.get("probabilityM", 0.74),
+            "U": 1 - parameters.get("probabilityM", 0.74)
+        }
+
+        return {"method": "cost_based", "costs": costs, "probabilities": probabilities}
+
+    elif classification_type == "weighted-threshold":
+        thresholds = {"match": parameters.get("thresholdMatch", 0.5)}
+        weights = parameters.get("columnWeights", {})
+
+        return {"method": "weighted", "thresholds": thresholds, "weights": weights}
+
+    elif classification_type == "threshold":
+        thresholds = {
+            "match": parameters.get("thresholdMatch", 0.5),
+            "not_match": parameters.get("thresholdNotMatch", 0.3)
+        }
+        possible_match = parameters.get("possibleMatch", False)
+
+        return {"method": "threshold_based", "thresholds": thresholds, "possible_match": possible_match}
+
+    elif classification_type == "fellegi-sunter":
+        thresholds = {
+            "match": parameters.get("thresholdMatch", 0.5),
+            "not_match": parameters.get("thresholdNotMatch", 0.3)
+        }
+
+        return {
+            "method": "fellegi_sunter",
+            "thresholds": thresholds,
+            "possible_match": parameters.get("possibleMatch", False),
+            "levels": parameters.get("agreementLevels"),
+            "max_iterations": parameters.get("maxIterations", 100)
+        }
+
+    else:
+        raise ValueError(f"Unsupported classification type: {classification_type}")
+
+
+def _blocking_pass(blocking_pass: Dict[str, Any]) -> Dict[str, Any]:
+    inputs = blocking_pass.get("inputs", {})
+    return {
+        "method": blocking_pass.get("algorithm"),
+        "columns": inputs.get("columns", []),
+        "window_size": inputs.get("windowSize", 5),
+        "max_window_size": inputs.get("maxWindowSize", 10),
+        "match_threshold": inputs.get("threshold", 0.8),
+        "n_letters": inputs.get("nLetters", 3),
+        "shingle_size": inputs.get("shingleSize", 3),
+        "num_permutations": inputs.get("numPermutations"),
+        "bands": inputs.get("bands", 20),
+        "rows": inputs.get("rows", 5),
+        "loose_threshold": inputs.get("looseThreshold", 0.5),
+        "tight_threshold": inputs.get("tightThreshold", 0.8),
+        "ngram_size": inputs.get("ngramSize"),
+        "k": inputs.get("k", 5),
+        "chunk_size": inputs.get("chunkSize", 4000000),
+        "min_suffix_length": inputs.get("minSuffixLength", 4),
+        "max_suffix_block_size": inputs.get("maxSuffixBlockSize", 10),
+    }
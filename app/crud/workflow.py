@@ -1,5 +1,5 @@
 from sqlalchemy.orm import Session
-from crud.project import get_project_by_id
+from crud.project import get_project_by_id, get_project_content, get_source_column
 from fastapi import HTTPException, UploadFile
 import models.workflow as _models
 import models.statistics as _models_statistics
@@ -9,6 +9,7 @@ import schemas.workflow as _schemas
 import schemas.statistics as _schemas_statistics
 from models.enums.step_name import StepName
 from pipeline.Evaluation import Evaluation
+from pipeline.Classifier import Classifier
 import datetime as _dt
 from typing import List
 import pandas as pd
@@ -170,10 +171,11 @@ async def get_workflow_file_content(workflow_id: int, db: Session, user_id: int)
         raise HTTPException(status_code=403,
                             detail="Not enough permissions to access this workflow")
 
-    if not project.file_content:
+    file_content = get_project_content(project)
+    if not file_content:
         raise HTTPException(status_code=404, detail="No file content available for this workflow")
 
-    return extract_unique_columns(project.file_content)
+    return extract_unique_columns(file_content)
 
 
 
@@ -189,10 +191,11 @@ async def get_workflow_content(workflow_id: int, db: Session, user_id: int):
         raise HTTPException(status_code=403,
                             detail="Not enough permissions to access this workflow")
 
-    if not project.file_content:
+    file_content = get_project_content(project)
+    if not file_content:
         raise HTTPException(status_code=404, detail="No file content available for this workflow")
 
-    return project.file_content
+    return file_content
 
 
 async def get_workflow_processed_data(workflow_id: int, db: Session, user_id: int):
@@ -205,7 +208,18 @@ async def get_workflow_processed_data(workflow_id: int, db: Session, user_id: in
     project = await get_project_by_id(db=db, project_id=workflow.project_id)
 
     if not workflow.last_step:
-        return project.file_content
+        return get_project_content(project)
+
+    if workflow.last_step == StepName.CLASSIFICATION and workflow.processed_data and workflow.blocked_data:
+        # The saved pairs carry only the compared fields; the full record
+        # details are joined here, for display.
+        classified_data = pd.DataFrame(workflow.processed_data)
+        classifier = Classifier(blocked_data=pd.DataFrame(workflow.blocked_data), comparison_table=classified_data)
+        try:
+            details = classifier.row_details(classified_data)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail={"message": str(e)})
+        return json.loads(details.to_json(orient='records', date_format='iso'))
 
     return workflow.processed_data
 
@@ -218,10 +232,10 @@ async def get_evaluation(workflow_id: int, db: Session, user_id: int, type: str)
 
     project = await get_project_by_id(db=db, project_id=workflow.project_id)
 
-    source_data = pd.DataFrame(project.file_content)
+    source_data = pd.DataFrame(get_project_content(project))
     classified_data = pd.DataFrame(workflow.processed_data)
 
-    evaluation = Evaluation(source_data, classified_data)
+    evaluation = Evaluation(source_data, classified_data, source_column=get_source_column(project))
     if type == 'statistics':
         evaluation.get_statistics()
     elif type == 'evaluated_data':
@@ -232,6 +246,26 @@ async def get_evaluation(workflow_id: int, db: Session, user_id: int, type: str)
     return evaluation.retrieve_dataframe_from_jsonb(type)
 
 
+async def get_threshold_sweep(workflow_id: int, db: Session, user_id: int, sweep: _schemas.ThresholdSweep):
+    workflow = await get_workflow(workflow_id=workflow_id, db=db, user_id=user_id)
+
+    if workflow.last_step not in (StepName.FIELD_AND_RECORD_COMPARISON, StepName.CLASSIFICATION) \
+            or not workflow.processed_data:
+        raise HTTPException(
+            status_code=400,
+            detail={"message": "The workflow needs a saved comparison step for a threshold sweep."}
+        )
+
+    classifier = Classifier(blocked_data=pd.DataFrame(workflow.blocked_data or []),
+                            comparison_table=pd.DataFrame(workflow.processed_data))
+    try:
+        result = classifier.threshold_sweep(weights=sweep.weights, true_matches=sweep.true_matches)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail={"message": str(e)})
+
+    return json.loads(result.to_json(orient='records'))
+
+
 async def save_statistics(workflow_id: int, db: Session, user_id: int, title: str):
     workflow = await get_workflow_by_id(db, workflow_id)
     project = await get_project_by_id(db, workflow.project_id)
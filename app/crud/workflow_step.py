@@ -3,14 +3,17 @@ import models.workflow_step as _models
 from models.enums.step_name import StepName
 import schemas.workflow_step as _schemas
 from crud.workflow import get_workflow_by_id
-from crud.project import get_project_by_id
-from crud.step_executor import execute
+from crud.project import get_project_by_id, get_project_content, get_source_column
+from crud.step_executor import execute, dry_run_blocking as _dry_run_blocking
+from crud.lookup import try_refresh_lookup
 
 
 async def save_workflow_step(db: Session, workflow_step: _schemas.WorkflowStep, workflow_id: int):
+    # The executor may add results to the parameters (e.g. fitted estimates).
+    parameters = dict(workflow_step.parameters or {})
     step = _models.WorkflowStep(
         name=workflow_step.step,
-        parameters=workflow_step.parameters,
+        parameters=parameters,
         workflow_id=workflow_id
     )
 
@@ -25,16 +28,15 @@ async def save_workflow_step(db: Session, workflow_step: _schemas.WorkflowStep,
     if existing_step is None:
         db.add(step)
     else:
-        existing_step.parameters = workflow_step.parameters
+        existing_step.parameters = parameters
         db.add(existing_step)
 
 
-    data_to_process = project.file_content
+    data_to_process = get_project_content(project)
     if workflow.processed_data:
         data_to_process = workflow.processed_data
-    processed_data = await execute(data_to_process, workflow_step.step,
-                             existing_step.parameters if existing_step else step.parameters,
-                                   workflow.blocked_data)
+    processed_data = await execute(data_to_process, workflow_step.step, parameters, workflow.blocked_data,
+                                   source_column=get_source_column(project))
     workflow.processed_data = processed_data
     if workflow_step.step == StepName.BLOCK_BUILDING:
         workflow.blocked_data = processed_data
@@ -43,6 +45,8 @@ async def save_workflow_step(db: Session, workflow_step: _schemas.WorkflowStep,
     db.refresh(existing_step if existing_step else step)
     db.refresh(workflow)
 
+    await try_refresh_lookup(db, workflow_id)
+
 
 async def get_last_step(db: Session, workflow_id: int):
     workflow = await get_workflow_by_id(db, workflow_id)
@@ -54,4 +58,17 @@ async def get_step(db: Session, workflow_id: int, step_name: str):
     return db.query(_models.WorkflowStep).filter(
         _models.WorkflowStep.name == step_name,
         _models.WorkflowStep.workflow_id == workflow_id
-    ).first()
\ No newline at end of file
+    ).first()
+
+async def dry_run_blocking(db: Session, dry_run: _schemas.BlockingDryRun, workflow_id: int):
+    workflow = await get_workflow_by_id(db, workflow_id)
+    project = await get_project_by_id(db, workflow.project_id)
+
+    data_to_process = get_project_content(project)
+    if workflow.last_step == StepName.DATA_PREPROCESSING and workflow.processed_data:
+        data_to_process = workflow.processed_data
+    elif workflow.blocked_data:
+        data_to_process = workflow.blocked_data
+
+    return await _dry_run_blocking(data_to_process, dry_run.blocking, dry_run.comparison,
+                                   sample_size=dry_run.sample_size, source_column=get_source_column(project))
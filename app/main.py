@@ -1,7 +1,7 @@
 import fastapi as _fastapi
 from routers import users, auth, projects, workflows, workflow_step
 from fastapi.middleware.cors import CORSMiddleware
-from common.dependencies import _add_tables
+from common.dependencies import _add_tables, _warm_lookups
 from fastapi import File, UploadFile, HTTPException, Depends, status
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
 from jose import JWTError, jwt
@@ -23,6 +23,7 @@ app.add_middleware(
 @app.on_event("startup")
 async def startup():
     _add_tables()
+    await _warm_lookups()
 
 app.include_router(users.router)
 app.include_router(auth.router)
@@ -2,4 +2,7 @@ from .user import User
 from .project import Project
 from .workflow import Workflow
 from .workflow_step import WorkflowStep
-from .statistics import Statistics
\ No newline at end of file
+from .statistics import Statistics
+from .blocking_index import BlockingIndex, BlockingIndexRecord
+from .linked_dataset import LinkedDataset
+from .appended_record import AppendedRecord
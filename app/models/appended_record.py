@@ -0,0 +1,17 @@
+import datetime as dt
+from sqlalchemy import Column, Integer, DateTime, ForeignKey
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.orm import relationship
+from config.database import Base
+
+
+class AppendedRecord(Base):
+    __tablename__ = "appended_records"
+
+    id = Column(Integer, primary_key=True, index=True)
+    record = Column(JSONB, nullable=False)
+    date_created = Column(DateTime, default=dt.datetime.utcnow, nullable=False)
+
+    project_id = Column(Integer, ForeignKey('projects.id'), nullable=False, index=True)
+
+    project = relationship("Project", back_populates="appended_records")
@@ -0,0 +1,38 @@
+import datetime as dt
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, UniqueConstraint, Index
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.orm import relationship
+from config.database import Base
+
+
+class BlockingIndex(Base):
+    __tablename__ = "blocking_indexes"
+
+    id = Column(Integer, primary_key=True, index=True)
+    columns = Column(JSONB, nullable=False)
+    num_records = Column(Integer, nullable=False, default=0)
+    date_created = Column(DateTime, default=dt.datetime.utcnow, nullable=False)
+    date_updated = Column(DateTime, default=dt.datetime.utcnow, onupdate=dt.datetime.utcnow, nullable=False)
+    records = relationship("BlockingIndexRecord", back_populates="blocking_index", cascade="all, delete-orphan")
+
+    project_id = Column(Integer, ForeignKey('projects.id'), nullable=False, unique=True)
+
+    project = relationship("Project", back_populates="blocking_index")
+
+
+class BlockingIndexRecord(Base):
+    # One posting per indexed record: its blocking key and ID. New records
+    # only insert their own rows and read the rows of their keys.
+    __tablename__ = "blocking_index_records"
+    __table_args__ = (
+        UniqueConstraint('blocking_index_id', 'record_id'),
+        Index('ix_blocking_index_records_key', 'blocking_index_id', 'key'),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    key = Column(String, nullable=False)
+    record_id = Column(String, nullable=False)
+
+    blocking_index_id = Column(Integer, ForeignKey('blocking_indexes.id'), nullable=False)
+
+    blocking_index = relationship("BlockingIndex", back_populates="records")
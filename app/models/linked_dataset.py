@@ -0,0 +1,18 @@
+import datetime as dt
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.orm import relationship
+from config.database import Base
+
+
+class LinkedDataset(Base):
+    __tablename__ = "linked_datasets"
+
+    id = Column(Integer, primary_key=True, index=True)
+    filename = Column(String, nullable=False)
+    file_content = Column(JSONB)
+    date_created = Column(DateTime, default=dt.datetime.utcnow, nullable=False)
+
+    project_id = Column(Integer, ForeignKey('projects.id'), nullable=False, unique=True)
+
+    project = relationship("Project", back_populates="linked_dataset")
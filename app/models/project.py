@@ -16,6 +16,12 @@ class Project(Base):
     date_created = Column(DateTime, default=dt.datetime.utcnow, nullable=False)
     date_updated = Column(DateTime, default=dt.datetime.utcnow, onupdate=dt.datetime.utcnow, nullable=False)
     workflows = relationship("Workflow", back_populates="project", cascade="all, delete-orphan")
+    blocking_index = relationship("BlockingIndex", back_populates="project", uselist=False,
+                                  cascade="all, delete-orphan")
+    linked_dataset = relationship("LinkedDataset", back_populates="project", uselist=False,
+                                  cascade="all, delete-orphan")
+    appended_records = relationship("AppendedRecord", back_populates="project", order_by="AppendedRecord.id",
+                                    cascade="all, delete-orphan")
 
     user_id = Column(Integer, ForeignKey('users.id'), nullable=False)
 
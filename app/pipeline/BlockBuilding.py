@@ -1,22 +1,34 @@
 import pandas as pd
 import numpy as np
-from fuzzywuzzy import fuzz
 from jellyfish import soundex
+from rapidfuzz.distance import Indel
+from rapidfuzz.process import cpdist
 import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+from .CandidatePairs import CandidatePairs
+from .Comparison import Comparison
 
 
 class BlockBuilding:
-    def __init__(self, data, method):
+    def __init__(self, data, method, source_column=None):
         self.data = data
         self.method = method
+        self.source_column = source_column
         self.blocks = None
+        self.candidate_pairs = None
+        self.block_memberships = None
         self.num_blocks = 0
         self.parameters = {}
 
     def build_blocks(self, columns=None, window_size=None, max_window_size=None, match_threshold=None, n_letters=3,
-                     block_index=1):
-        if columns is None:
+                     block_index=1, passes=None, workers=1, shingle_size=3, num_permutations=None, bands=20, rows=5,
+                     loose_threshold=0.5, tight_threshold=0.8, ngram_size=None, k=5, chunk_size=4000000,
+                     min_suffix_length=4, max_suffix_block_size=10):
+        if columns is None and self.method != 'multiPass':
             raise ValueError("You must specify the columns for generating keys.")
+        if self.source_column is not None and self.source_column not in self.data.columns:
+            raise ValueError(f"Source column '{self.source_column}' not found in data.")
 
         self.parameters = {
             'columns': columns,
@@ -25,41 +37,115 @@ class BlockBuilding:
             'match_threshold': match_threshold,
             'n_letters': n_letters,
         }
-
-        if self.method == 'standardBlocking':
+        if self.method == 'minhashLSH':
+            self.parameters.update({
+                'shingle_size': shingle_size,
+                'num_permutations': num_permutations if num_permutations is not None else bands * rows,
+                'bands': bands,
+                'rows': rows,
+            })
+        elif self.method == 'setSimilarityJoin':
+            self.parameters['shingle_size'] = shingle_size
+        elif self.method == 'knnBlocking':
+            self.parameters.update({'shingle_size': shingle_size, 'k': k})
+        elif self.method == 'suffixArrayBlocking':
+            self.parameters.update({
+                'min_suffix_length': min_suffix_length,
+                'max_suffix_block_size': max_suffix_block_size,
+            })
+        elif self.method == 'canopyClustering':
+            self.parameters.update({
+                'loose_threshold': loose_threshold,
+                'tight_threshold': tight_threshold,
+                'ngram_size': ngram_size,
+            })
+
+        if self.method == 'multiPass':
+            if not passes:
+                raise ValueError("At least one blocking pass must be provided for the multi-pass method.")
+            self.multi_pass_blocking(passes, workers)
+        elif self.method == 'standardBlocking':
             self.standard_blocking(columns)
         elif self.method == 'sortedNeighborhood':
             if window_size is None:
                 raise ValueError("Window size must be provided for the sorted neighborhood method.")
             self.sorted_neighborhood(columns, window_size, n_letters)
+        elif self.method == 'slidingSortedNeighborhood':
+            if window_size is None:
+                raise ValueError("Window size must be provided for the sliding sorted neighborhood method.")
+            self.sliding_sorted_neighborhood(columns, window_size, n_letters)
         elif self.method == 'dynamicSortedNeighborhood':
             if max_window_size is None or match_threshold is None:
                 raise ValueError(
                     "Both max_window_size and match_threshold must be provided for the dynamic sorted neighborhood method.")
             self.dynamic_sorted_neighborhood(columns, max_window_size, match_threshold, n_letters)
+        elif self.method == 'minhashLSH':
+            if num_permutations is None:
+                num_permutations = bands * rows
+            if shingle_size < 1 or bands < 1 or rows < 1:
+                raise ValueError("Shingle size, bands and rows must be positive for the MinHash-LSH method.")
+            if bands * rows > num_permutations:
+                raise ValueError("bands * rows cannot exceed the number of permutations for the MinHash-LSH method.")
+            self.minhash_lsh_blocking(columns, shingle_size, num_permutations, bands, rows)
+        elif self.method == 'canopyClustering':
+            if not 0 < loose_threshold <= tight_threshold <= 1:
+                raise ValueError(
+                    "Canopy clustering requires 0 < loose_threshold <= tight_threshold <= 1.")
+            self.canopy_clustering(columns, loose_threshold, tight_threshold, ngram_size)
+        elif self.method == 'setSimilarityJoin':
+            if match_threshold is None or not 0 < match_threshold <= 1:
+                raise ValueError("A match_threshold in (0, 1] must be provided for the set similarity join method.")
+            if shingle_size < 1:
+                raise ValueError("Shingle size must be positive for the set similarity join method.")
+            self.set_similarity_join(columns, match_threshold, shingle_size)
+        elif self.method == 'knnBlocking':
+            if k < 1 or shingle_size < 1 or chunk_size < 1:
+                raise ValueError("k, shingle size and chunk size must be positive for the kNN blocking method.")
+            self.knn_blocking(columns, k, shingle_size, chunk_size)
+        elif self.method == 'suffixArrayBlocking':
+            if min_suffix_length < 1 or max_suffix_block_size < 2:
+                raise ValueError(
+                    "Suffix array blocking requires min_suffix_length >= 1 and max_suffix_block_size >= 2.")
+            self.suffix_array_blocking(columns, min_suffix_length, max_suffix_block_size)
         else:
             raise ValueError(
-                "Invalid method. Use 'standardBlocking', 'sortedNeighborhood', or 'dynamicSortedNeighborhood'.")
+                "Invalid method. Use 'standardBlocking', 'sortedNeighborhood', 'slidingSortedNeighborhood', "
+                "'dynamicSortedNeighborhood', 'minhashLSH', 'canopyClustering', 'setSimilarityJoin', "
+                "'knnBlocking', 'suffixArrayBlocking' or 'multiPass'.")
+
+        # Pair-based methods are restricted to cross-source pairs here; block
+        # based ones keep their blocks and are restricted in get_candidate_pairs.
+        if self.source_column is not None and self.candidate_pairs is not None:
+            self.candidate_pairs = self.candidate_pairs.cross_source(self.blocks[self.source_column])
 
         return self.display_block(block_index)
 
     def standard_blocking(self, columns):
         self.blocks = self.data.copy()
 
-        self.blocks['BKV'] = self.blocks[columns].apply(
-            lambda col: col.map(lambda x: soundex(x) if isinstance(x, str) else '')
-        ).agg(' '.join, axis=1)
+        keys = [self._column_keys(self.blocks[col], soundex) for col in columns]
+        self.blocks['BKV'] = keys[0].str.cat(keys[1:], sep=' ') if len(keys) > 1 else keys[0]
 
         self.blocks['block_id'] = self.blocks.groupby('BKV').ngroup() + 1
 
         self.num_blocks = self.blocks['block_id'].nunique()
 
+    @staticmethod
+    def _column_keys(column, key_function):
+        # Keys are computed once per distinct value and mapped back by code.
+        codes, uniques = pd.factorize(column)
+        keys = np.array([key_function(value) if isinstance(value, str) else '' for value in uniques] + [''],
+                        dtype=object)
+        return pd.Series(keys[codes], index=column.index, dtype=object)
+
+    def _sorting_keys(self, columns, n_letters):
+        keys = [self._column_keys(self.blocks[col], lambda x: x[:n_letters + 1]) for col in columns]
+        return keys[0].str.cat(keys[1:], sep='') if len(keys) > 1 else keys[0]
+
     def sorted_neighborhood(self, columns, window_size, n_letters):
         self.blocks = self.data.copy()
 
-        self.blocks['SKV'] = self.blocks[columns].apply(
-            lambda col: col.map(lambda x: x[:min(n_letters + 1, len(x))] if isinstance(x, str) else '')
-        ).agg(''.join, axis=1)
+        self.blocks['SKV'] = self._sorting_keys(columns, n_letters)
 
         self.blocks = self.blocks.sort_values(by='SKV').reset_index(drop=True)
 
@@ -67,33 +153,49 @@ class BlockBuilding:
 
         self.num_blocks = self.blocks['block_id'].nunique()
 
+    def sliding_sorted_neighborhood(self, columns, window_size, n_letters):
+        self.blocks = self.data.copy()
+
+        self.blocks['SKV'] = self._sorting_keys(columns, n_letters)
+
+        self.blocks = self.blocks.sort_values(by='SKV').reset_index(drop=True)
+
+        # Each record is compared with the next window_size - 1 records in SKV
+        # order; block_id names the window anchored at that record.
+        num_rows = len(self.blocks)
+        row1 = np.repeat(np.arange(num_rows, dtype=np.int32), max(window_size - 1, 0))
+        row2 = row1 + np.tile(np.arange(1, max(window_size, 1), dtype=np.int32), num_rows)
+        inside = row2 < num_rows
+        self.candidate_pairs = CandidatePairs(row1[inside], row2[inside])
+
+        self.blocks['block_id'] = np.arange(1, num_rows + 1)
+
+        self.num_blocks = num_rows
+
     def dynamic_sorted_neighborhood(self, columns, max_window_size, match_threshold, n_letters):
         self.blocks = self.data.copy()
 
-        self.blocks['SKV'] = self.blocks[columns].apply(
-            lambda col: col.map(lambda x: x[:min(n_letters + 1, len(x))] if isinstance(x, str) else '')
-        ).agg(''.join, axis=1)
+        self.blocks['SKV'] = self._sorting_keys(columns, n_letters)
         self.blocks = self.blocks.sort_values(by='SKV').reset_index(drop=True)
 
-        block_ids = []
+        keys = self.blocks['SKV'].to_numpy(dtype=object)
+        width = max(max_window_size, 1) - 1
+        chunk_rows = max(1, 1000000 // max(width, 1))
+        block_ids = np.empty(len(keys), dtype=np.int32)
         current_block_id = 1
         window_start = 0
+        chunk_start, similarity = 0, np.empty((0, width))
 
-        while window_start < len(self.blocks):
-            # Start with a single row
-            window_end = window_start + 1
+        while window_start < len(keys):
+            if window_start >= chunk_start + len(similarity):
+                chunk_start = window_start
+                similarity = self._window_ratios(keys, chunk_start, min(chunk_start + chunk_rows, len(keys)), width)
 
-            while window_end < len(self.blocks) and (window_end - window_start) < max_window_size:
-                similarity = fuzz.ratio(
-                    self.blocks['SKV'].iloc[window_start],
-                    self.blocks['SKV'].iloc[window_end]
-                )
-                if similarity >= match_threshold * 100:
-                    window_end += 1
-                else:
-                    break
+            # The window ends before the first key that falls below the threshold.
+            below = similarity[window_start - chunk_start] < match_threshold * 100
+            window_end = window_start + 1 + (int(below.argmax()) if below.any() else width)
 
-            block_ids.extend([current_block_id] * (window_end - window_start))
+            block_ids[window_start:window_end] = current_block_id
 
             window_start = window_end
             current_block_id += 1
@@ -102,6 +204,648 @@ class BlockBuilding:
 
         self.num_blocks = current_block_id - 1
 
+    @staticmethod
+    def _window_ratios(keys, start, end, width):
+        # fuzz.ratio of every key in [start, end) against each of the next
+        # `width` keys, one row per key; positions past the end score -1.
+        anchors = np.repeat(np.arange(start, end), width)
+        candidates = anchors + np.tile(np.arange(1, width + 1), end - start)
+        inside = candidates < len(keys)
+        anchors, candidates = keys[anchors[inside]], keys[candidates[inside]]
+
+        # Same scale and rounding as fuzz.ratio: rounded 0-100, 100 for equal
+        # keys and 0 when only one of them is empty.
+        ratios = np.round(100 * cpdist(anchors, candidates, scorer=Indel.normalized_similarity, dtype=np.float64))
+        ratios[(anchors == '') | (candidates == '')] = 0
+        ratios[anchors == candidates] = 100
+
+        similarity = np.full((end - start) * width, -1.0)
+        similarity[inside] = ratios
+        return similarity.reshape(end - start, width)
+
+    def minhash_lsh_blocking(self, columns, shingle_size, num_permutations, bands, rows, seed=0):
+        self.blocks = self.data.copy()
+
+        profiles = Comparison.qgram_profiles(self._joined_text(columns).to_numpy(dtype=object), q=shingle_size)
+        signatures = self._minhash_signatures(profiles['ids'], profiles['offsets'], num_permutations, seed)
+
+        # Records sharing every row of a band fall into one bucket; all pairs
+        # within a bucket are candidates. Records shorter than a shingle have
+        # no signature and take part in no bucket.
+        records = np.flatnonzero(np.diff(profiles['offsets']) > 0)
+        band_pairs = []
+        for band in range(bands):
+            band_rows = np.ascontiguousarray(signatures[records, band * rows:(band + 1) * rows])
+            band_keys = band_rows.view(np.dtype((np.void, band_rows.itemsize * rows))).ravel()
+            _, buckets = np.unique(band_keys, return_inverse=True)
+            pairs = CandidatePairs.from_block_ids(buckets.ravel())
+            band_pairs.append(CandidatePairs(records[pairs.row1], records[pairs.row2]))
+        self.candidate_pairs = CandidatePairs.union(band_pairs, len(self.blocks))
+
+        self.parameters['num_pairs'] = len(self.candidate_pairs)
+
+        self.blocks['block_id'] = np.arange(1, len(self.blocks) + 1)
+
+        self.num_blocks = len(self.blocks)
+
+    @staticmethod
+    def _minhash_signatures(shingle_ids, offsets, num_permutations, seed, chunk_size=4000000):
+        # Permutations are simulated with universal hashes (a * x + b) mod p
+        # over the shingle ids; a record's signature is the minimum per hash.
+        prime = np.uint64(2 ** 31 - 1)
+        rng = np.random.default_rng(seed)
+        a = rng.integers(1, prime, num_permutations, dtype=np.uint64)
+        b = rng.integers(0, prime, num_permutations, dtype=np.uint64)
+
+        num_records = len(offsets) - 1
+        signatures = np.full((num_records, num_permutations), prime, dtype=np.uint32)
+        records = np.flatnonzero(np.diff(offsets) > 0)
+        shingle_ids = shingle_ids.astype(np.uint64)
+
+        # Records are hashed in chunks of roughly chunk_size hash values.
+        chunk_records = max(1, chunk_size // max(num_permutations * len(shingle_ids) // max(len(records), 1), 1))
+        for start in range(0, len(records), chunk_records):
+            chunk = records[start:start + chunk_records]
+            first, last = offsets[chunk[0]], offsets[chunk[-1] + 1]
+            hashes = (shingle_ids[first:last, None] * a + b) % prime
+            signatures[chunk] = np.minimum.reduceat(hashes, offsets[chunk] - first, axis=0)
+        return signatures
+
+    def set_similarity_join(self, columns, threshold, shingle_size):
+        self.blocks = self.data.copy()
+
+        # Exact Jaccard join over the q-gram sets (PPJoin): q-gram ids are
+        # re-ranked rarest first, so prefixes hold the most selective q-grams.
+        profiles = Comparison.qgram_profiles(self._joined_text(columns).to_numpy(dtype=object), q=shingle_size)
+        offsets = profiles['offsets']
+        sizes = np.diff(offsets)
+        frequencies = np.bincount(profiles['ids'], minlength=profiles['num_qgrams'])
+        rank = np.empty(len(frequencies), dtype=np.int64)
+        rank[np.argsort(frequencies, kind='stable')] = np.arange(len(frequencies))
+        tokens = rank[profiles['ids']]
+
+        postings = {}
+        row1, row2 = [], []
+        for x in np.argsort(sizes, kind='stable')[np.count_nonzero(sizes == 0):].tolist():
+            size_x = int(sizes[x])
+            record = np.sort(tokens[offsets[x]:offsets[x + 1]]).tolist()
+            min_size = threshold * size_x - 1e-9
+            probe_prefix = size_x - int(np.ceil(threshold * size_x - 1e-9)) + 1
+            index_prefix = size_x - int(np.ceil(2 * threshold / (1 + threshold) * size_x - 1e-9)) + 1
+
+            overlaps = {}
+            for i, token in enumerate(record[:probe_prefix]):
+                for y, j, size_y in postings.get(token, ()):
+                    # Length filter, then positional filter: the overlap seen so
+                    # far plus what the unseen suffixes allow must reach alpha.
+                    if size_y < min_size or overlaps.get(y) == -1:
+                        continue
+                    alpha = np.ceil(threshold / (1 + threshold) * (size_x + size_y) - 1e-9)
+                    if overlaps.get(y, 0) + 1 + min(size_x - i - 1, size_y - j - 1) >= alpha:
+                        overlaps[y] = overlaps.get(y, 0) + 1
+                    else:
+                        overlaps[y] = -1
+            for i, token in enumerate(record[:index_prefix]):
+                postings.setdefault(token, []).append((x, i, size_x))
+
+            candidates = [y for y, overlap in overlaps.items() if overlap > 0]
+            row1.extend(candidates)
+            row2.extend([x] * len(candidates))
+
+        # Candidates are verified with the q-gram similarity on distinct q-grams,
+        # which is their exact Jaccard coefficient.
+        pairs = CandidatePairs(row1, row2)
+        verification = {**profiles, 'counts': np.ones(len(tokens))}
+        similarities = Comparison._qgram_chunk_scores(verification, pairs.row1, pairs.row2)
+        keep = similarities >= threshold - 1e-9
+        self.candidate_pairs = CandidatePairs.from_keys(
+            CandidatePairs(pairs.row1[keep], pairs.row2[keep]).keys(len(self.blocks)), len(self.blocks))
+
+        self.parameters['num_pairs'] = len(self.candidate_pairs)
+        self.parameters['verified_pairs'] = len(pairs)
+
+        self.blocks['block_id'] = np.arange(1, len(self.blocks) + 1)
+
+        self.num_blocks = len(self.blocks)
+
+    def canopy_clustering(self, columns, loose_threshold, tight_threshold, ngram_size=None):
+        self.blocks = self.data.copy()
+
+        ids, weights, offsets, _, _ = self._tfidf_rows(self._joined_text(columns), ngram_size)
+        num_rows = len(self.blocks)
+        rows = np.repeat(np.arange(num_rows), np.diff(offsets))
+
+        # Inverted index: the postings of token t are
+        # posting_rows/posting_weights[posting_offsets[t]:posting_offsets[t + 1]].
+        order = np.argsort(ids, kind='stable')
+        posting_rows, posting_weights = rows[order], weights[order]
+        posting_offsets = np.searchsorted(ids[order], np.arange(ids.max() + 2 if len(ids) else 1))
+
+        available = np.ones(num_rows, dtype=bool)
+        block_ids = np.zeros(num_rows, dtype=np.int32)
+        member_records, member_canopies = [], []
+        num_canopies = 0
+        for center in range(num_rows):
+            if not available[center]:
+                continue
+
+            # Cosine similarity of the center with every record sharing a token,
+            # accumulated over the postings of the center's tokens only.
+            tokens = ids[offsets[center]:offsets[center + 1]]
+            starts, lengths = posting_offsets[tokens], np.diff(posting_offsets)[tokens]
+            postings = np.repeat(starts - np.cumsum(lengths) + lengths, lengths) + np.arange(lengths.sum())
+            contributions = posting_weights[postings] * np.repeat(weights[offsets[center]:offsets[center + 1]], lengths)
+            neighbors, inverse = np.unique(posting_rows[postings], return_inverse=True)
+            similarity = np.bincount(inverse, weights=contributions, minlength=len(neighbors))
+
+            members = np.union1d(neighbors[similarity >= loose_threshold - 1e-9], [center])
+            available[neighbors[similarity >= tight_threshold - 1e-9]] = False
+            available[center] = False
+
+            num_canopies += 1
+            block_ids[members[block_ids[members] == 0]] = num_canopies
+            member_records.append(members)
+            member_canopies.append(np.full(len(members), num_canopies))
+
+        # Canopies overlap, so block_id only names the canopy that claimed the
+        # record first; the candidate pairs cover every canopy a record is in.
+        member_records = np.concatenate(member_records) if member_records else np.empty(0, dtype=np.int64)
+        pairs = CandidatePairs.from_block_ids(np.concatenate(member_canopies) if member_canopies else [])
+        self.candidate_pairs = CandidatePairs.union(
+            [CandidatePairs(member_records[pairs.row1], member_records[pairs.row2])], num_rows)
+
+        self.parameters['num_pairs'] = len(self.candidate_pairs)
+
+        self.blocks['block_id'] = block_ids
+
+        self.num_blocks = num_canopies
+
+    def knn_blocking(self, columns, k, ngram_size, chunk_size=4000000):
+        self.blocks = self.data.copy()
+
+        ids, weights, offsets, _, _ = self._tfidf_rows(self._joined_text(columns), ngram_size)
+        num_rows = len(self.blocks)
+        rows = np.repeat(np.arange(num_rows), np.diff(offsets))
+        order = np.argsort(ids, kind='stable')
+        posting_rows, posting_weights = rows[order], weights[order]
+        posting_offsets = np.searchsorted(ids[order], np.arange(ids.max() + 2 if len(ids) else 1))
+
+        sources = None
+        if self.source_column is not None:
+            sources, _ = pd.factorize(self.blocks[self.source_column])
+
+        # A chunk of records is multiplied against the inverted index; only
+        # the postings its tokens touch are accumulated, and chunks are cut
+        # so that they stay within chunk_size entries.
+        num_neighbors = min(k, num_rows - 1)
+        entry_work = np.diff(posting_offsets)[ids] if len(ids) else np.empty(0, dtype=np.int64)
+        cumulative_work = np.cumsum(np.bincount(rows, weights=entry_work, minlength=num_rows))
+        row1, row2 = [], []
+        start = 0
+        while start < num_rows and num_neighbors > 0:
+            done = cumulative_work[start - 1] if start else 0
+            end = max(int(np.searchsorted(cumulative_work, done + chunk_size, side='right')), start + 1)
+
+            first, last = offsets[start], offsets[end]
+            tokens = ids[first:last]
+            starts, lengths = posting_offsets[tokens], np.diff(posting_offsets)[tokens]
+            postings = np.repeat(starts - np.cumsum(lengths) + lengths, lengths) + np.arange(lengths.sum())
+            owners, partners = np.repeat(rows[first:last], lengths), posting_rows[postings]
+            contributions = posting_weights[postings] * np.repeat(weights[first:last], lengths)
+            kept = owners != partners
+            if sources is not None:
+                kept &= sources[owners] != sources[partners]
+
+            # Contributions to the same (record, partner) cell are summed.
+            cells, inverse = np.unique(owners[kept].astype(np.int64) * num_rows + partners[kept],
+                                       return_inverse=True)
+            similarity = np.bincount(inverse.ravel(), weights=contributions[kept], minlength=len(cells))
+            owners, partners = cells // num_rows, cells % num_rows
+
+            # Every record keeps its k most similar partners; ties go to the
+            # lower position. Cells are sorted by record and partner already,
+            # so one stable sort on the record with the similarity quantised
+            # into the low 32 bits ranks the partners of every record.
+            rank_keys = owners << 32 | np.round((1 - np.clip(similarity, 0, 1)) * 2 ** 31).astype(np.int64)
+            order = np.argsort(rank_keys, kind='stable')
+            owners, partners = owners[order], partners[order]
+            group_starts = np.searchsorted(owners, owners)
+            nearest = np.arange(len(owners)) - group_starts < num_neighbors
+            row1.append(owners[nearest])
+            row2.append(partners[nearest])
+            start = end
+
+        # Records with fewer than k partners sharing a token are filled up with
+        # zero-similarity records, so the candidate budget is fixed up front.
+        # Mutual neighbours give the same unordered pair twice; it is kept once.
+        pairs = [CandidatePairs(np.concatenate(row1), np.concatenate(row2))] if row1 else []
+        if pairs:
+            pairs.append(self._fill_neighbors(pairs[0], num_rows, num_neighbors, sources))
+        self.candidate_pairs = CandidatePairs.union(pairs, num_rows)
+
+        self.parameters['num_pairs'] = len(self.candidate_pairs)
+
+        self.blocks['block_id'] = np.arange(1, num_rows + 1)
+
+        self.num_blocks = num_rows
+
+    @staticmethod
+    def _fill_neighbors(pairs, num_rows, num_neighbors, sources=None):
+        # Zero-similarity partners are taken in position order, skipping the
+        # record itself, its found partners and, with sources, its own source;
+        # the first k + 1 eligible records always hold enough of them.
+        found = np.bincount(pairs.row1, minlength=num_rows)
+        short = np.flatnonzero(found < num_neighbors)
+        if not len(short):
+            return CandidatePairs(np.empty(0), np.empty(0))
+
+        width = num_neighbors + 1
+        if sources is None:
+            candidates = np.broadcast_to(np.arange(min(width, num_rows)), (len(short), min(width, num_rows)))
+        else:
+            eligible = [np.flatnonzero(sources != source)[:width] for source in range(sources.max() + 1)]
+            width = max(len(records) for records in eligible)
+            padded = np.array([np.pad(records, (0, width - len(records)), constant_values=-1)
+                               for records in eligible])
+            candidates = padded[sources[short]]
+
+        keys = pairs.row1.astype(np.int64) * num_rows + pairs.row2
+        candidate_keys = short[:, None].astype(np.int64) * num_rows + candidates
+        usable = (candidates >= 0) & (candidates != short[:, None]) & ~np.isin(candidate_keys, keys)
+        taken = usable & (np.cumsum(usable, axis=1) <= (num_neighbors - found[short])[:, None])
+        return CandidatePairs(np.broadcast_to(short[:, None], candidates.shape)[taken], candidates[taken])
+
+    def suffix_array_blocking(self, columns, min_suffix_length, max_suffix_block_size):
+        self.blocks = self.data.copy()
+        num_rows = len(self.blocks)
+
+        owners, suffixes = self._suffix_blocks(self._joined_text(columns).to_numpy(dtype=object), min_suffix_length)
+
+        # Each distinct suffix is a block; blocks of common suffixes are dropped.
+        block_sizes = np.bincount(suffixes) if len(suffixes) else np.empty(0, dtype=np.int64)
+        kept = block_sizes[suffixes] <= max_suffix_block_size
+        pairs = CandidatePairs.from_block_ids(suffixes[kept])
+        self.candidate_pairs = CandidatePairs.union(
+            [CandidatePairs(owners[kept][pairs.row1], owners[kept][pairs.row2])], num_rows)
+
+        self.parameters['num_pairs'] = len(self.candidate_pairs)
+        self.parameters['num_suffix_blocks'] = int(np.count_nonzero(block_sizes > 1))
+        self.parameters['dropped_suffix_blocks'] = int(np.count_nonzero(block_sizes > max_suffix_block_size))
+
+        self.blocks['block_id'] = np.arange(1, num_rows + 1)
+
+        self.num_blocks = num_rows
+
+    @staticmethod
+    def _suffix_blocks(keys, min_suffix_length):
+        # All keys share one code point buffer; a suffix is an integer offset
+        # into it and ends with its key. Ranks are found by prefix doubling, so
+        # two suffixes get the same rank exactly when they are equal, and
+        # ordering by rank gives the sorted suffix array.
+        lengths = np.array([len(key) for key in keys], dtype=np.int64)
+        buffer = np.frombuffer(''.join(keys).encode('utf-32-le'), dtype=np.uint32)
+        ends = np.repeat(np.cumsum(lengths), lengths)
+        offsets = np.arange(len(buffer))
+
+        _, ranks = np.unique(buffer, return_inverse=True)
+        ranks = ranks.ravel().astype(np.int64) + 1
+        step = 1
+        while step < lengths.max(initial=0):
+            following = offsets + step
+            second = np.where(following < ends, ranks[np.minimum(following, len(buffer) - 1)], 0)
+            _, ranks = np.unique(ranks * (len(buffer) + 1) + second, return_inverse=True)
+            ranks = ranks.ravel() + 1
+            step *= 2
+
+        eligible = np.flatnonzero(ends - offsets >= min_suffix_length)
+        owners = np.repeat(np.arange(len(keys)), lengths)[eligible]
+        suffixes = np.unique(ranks[eligible], return_inverse=True)[1].ravel()
+        return owners, suffixes
+
+    @staticmethod
+    def _tfidf_rows(text, ngram_size=None):
+        # Rows of the L2-normalised TF-IDF matrix in CSR form, over word tokens
+        # or, with ngram_size, over character n-grams, with the token of every
+        # id and its idf.
+        if ngram_size:
+            profiles = Comparison.qgram_profiles(text.to_numpy(dtype=object), q=ngram_size)
+            ids, counts, offsets = profiles['ids'], profiles['counts'], profiles['offsets']
+            uniques = profiles['qgrams']
+        else:
+            tokens = text.reset_index(drop=True).str.split().explode().dropna()
+            token_ids, uniques = pd.factorize(tokens)
+            num_tokens = max(len(uniques), 1)
+            keys, counts = np.unique(tokens.index.to_numpy(dtype=np.int64) * num_tokens + token_ids,
+                                     return_counts=True)
+            ids = keys % num_tokens
+            offsets = np.searchsorted(keys // num_tokens, np.arange(len(text) + 1))
+
+        document_frequency = np.bincount(ids)
+        idf = np.log((1 + len(text)) / (1 + document_frequency)) + 1
+        weights = counts * idf[ids]
+
+        nonempty = np.flatnonzero(np.diff(offsets) > 0)
+        norms = np.ones(len(text))
+        if len(nonempty):
+            norms[nonempty] = np.sqrt(np.add.reduceat(weights ** 2, offsets[nonempty]))
+        weights = weights / np.repeat(norms, np.diff(offsets))
+        return ids, weights, offsets, np.asarray(uniques, dtype=object), idf
+
+    def _joined_text(self, columns):
+        text = [self.blocks[col].where(self.blocks[col].notna(), '').astype(str) for col in columns]
+        return text[0].str.cat(text[1:], sep=' ') if len(text) > 1 else text[0]
+
+    def multi_pass_blocking(self, passes, workers=1):
+        def run_pass(blocking_pass):
+            options = dict(blocking_pass)
+            block_builder = BlockBuilding(self.data, options.pop('method'))
+            block_builder.build_blocks(**options)
+            return block_builder
+
+        with ThreadPoolExecutor(max_workers=max(workers, 1)) as executor:
+            block_builders = list(executor.map(run_pass, passes))
+
+        # Pairs of every pass are mapped to positions in self.data and merged
+        # through their int64 keys, so the union holds each pair exactly once.
+        ids = pd.Index(self.data['ID'])
+        num_rows = len(self.data)
+        union = np.empty(0, dtype=np.int64)
+        pass_statistics = []
+        member_records, member_labels = [], []
+        for blocking_pass, block_builder in zip(passes, block_builders):
+            pairs = block_builder.get_candidate_pairs()
+            positions = ids.get_indexer(block_builder.blocks['ID'])
+            records, labels = block_builder._block_memberships()
+            member_labels.append(labels + max((int(label.max()) + 1 for label in member_labels if len(label)), default=0))
+            member_records.append(positions[records])
+            keys = CandidatePairs(positions[pairs.row1], positions[pairs.row2]).keys(num_rows)
+            new_keys = np.setdiff1d(keys, union, assume_unique=True)
+            union = np.union1d(union, new_keys)
+
+            pass_statistics.append({
+                **blocking_pass,
+                'num_blocks': int(block_builder.get_num_blocks()),
+                'num_pairs': int(len(keys)),
+                'new_pairs': int(len(new_keys)),
+            })
+
+        self.parameters['passes'] = pass_statistics
+        self.parameters['num_pairs'] = int(len(union))
+
+        self.blocks = self.data.copy()
+        self.candidate_pairs = CandidatePairs.from_keys(union, num_rows)
+        self.block_memberships = (np.concatenate(member_records), np.concatenate(member_labels))
+
+        self.blocks['block_id'] = np.arange(1, len(self.blocks) + 1)
+
+        self.num_blocks = len(self.blocks)
+
+    def refine_blocks(self, max_block_size=None, max_block_pairs=None, oversized='purge', drop_empty_keys=False,
+                      meta_blocking=None, top_k=None):
+        if self.blocks is None:
+            raise ValueError("No blocks have been generated. Run block building first.")
+        if oversized not in ('purge', 'split'):
+            raise ValueError("Invalid oversized block handling. Use 'purge' or 'split'.")
+        if meta_blocking not in (None, 'cbs', 'jaccard'):
+            raise ValueError("Invalid meta-blocking weighting scheme. Use 'cbs' or 'jaccard'.")
+        if meta_blocking is not None and (top_k is None or top_k < 1):
+            raise ValueError("top_k must be a positive number of edges per record for meta-blocking.")
+
+        size_limits = []
+        if max_block_size is not None:
+            size_limits.append(max_block_size)
+        if max_block_pairs is not None:
+            # Largest block size whose n * (n - 1) / 2 pairs fit the budget.
+            size_limits.append(int((1 + np.sqrt(1 + 8 * max_block_pairs)) // 2))
+        size_limit = min(size_limits) if size_limits else None
+        if size_limit is not None and size_limit < 1:
+            raise ValueError("Block size and pair limits must allow at least one record per block.")
+        if size_limit is not None and self.candidate_pairs is not None:
+            raise ValueError(
+                "Block size limits apply to block_id based methods; use meta-blocking to bound the candidate "
+                "pairs of pair-based methods.")
+
+        key_col = 'BKV' if 'BKV' in self.blocks.columns else 'SKV' if 'SKV' in self.blocks.columns else None
+        empty_keys = np.zeros(len(self.blocks), dtype=bool)
+        if drop_empty_keys and key_col is not None:
+            empty_keys = (self.blocks[key_col].fillna('').astype(str).str.strip() == '').to_numpy()
+
+        pairs_before = len(self.get_candidate_pairs())
+        statistics = {
+            'max_block_size': max_block_size,
+            'max_block_pairs': max_block_pairs,
+            'oversized': oversized,
+            'drop_empty_keys': drop_empty_keys,
+            'meta_blocking': meta_blocking,
+            'top_k': top_k,
+            'empty_key_records': int(empty_keys.sum()),
+            'oversized_blocks': 0,
+        }
+
+        if self.candidate_pairs is None:
+            self._limit_blocks(size_limit, oversized, empty_keys, statistics)
+        elif empty_keys.any():
+            pairs = self.candidate_pairs
+            keep = ~(empty_keys[pairs.row1] | empty_keys[pairs.row2])
+            self.candidate_pairs = CandidatePairs(pairs.row1[keep], pairs.row2[keep])
+
+        if meta_blocking is not None:
+            self._prune_blocking_graph(meta_blocking, top_k)
+
+        statistics['pairs_before'] = int(pairs_before)
+        statistics['pairs_after'] = int(len(self.get_candidate_pairs()))
+        self.parameters['refinement'] = statistics
+
+        return self.display_block()
+
+    def _limit_blocks(self, size_limit, oversized, empty_keys, statistics):
+        block_ids = self.blocks['block_id'].to_numpy()
+        num_rows = len(block_ids)
+        position = self.blocks.groupby('block_id', sort=False).cumcount().to_numpy()
+        block_sizes = self.blocks.groupby('block_id', sort=False)['block_id'].transform('size').to_numpy()
+
+        # Every record gets a sub-block within its block: split blocks are cut
+        # into consecutive chunks of size_limit, while purged and empty-key
+        # records each end up alone so they are compared with nobody.
+        sub_blocks = np.zeros(num_rows, dtype=np.int64)
+        alone = empty_keys.copy()
+        if size_limit is not None:
+            too_large = block_sizes > size_limit
+            statistics['oversized_blocks'] = int(pd.unique(block_ids[too_large]).size)
+            if oversized == 'split':
+                sub_blocks[too_large] = position[too_large] // size_limit
+            else:
+                alone |= too_large
+        sub_blocks[alone] = num_rows + position[alone]
+
+        codes, _ = pd.factorize(block_ids, sort=True)
+        _, new_block_ids = np.unique(codes.astype(np.int64) * 2 * num_rows + sub_blocks, return_inverse=True)
+        self.blocks['block_id'] = new_block_ids.ravel() + 1
+
+        self.num_blocks = self.blocks['block_id'].nunique()
+
+    def _prune_blocking_graph(self, scheme, top_k):
+        num_rows = len(self.blocks)
+        edges = self.get_candidate_pairs().keys(num_rows)
+
+        # Edge weights come from the blocks each pair shares: the number of
+        # common blocks, or that count over the blocks either record is in.
+        records, labels = self._block_memberships()
+        shared = CandidatePairs.from_block_ids(labels)
+        shared_keys, common_blocks = CandidatePairs(records[shared.row1], records[shared.row2]).keys(
+            num_rows, return_counts=True)
+        found = np.searchsorted(shared_keys, edges).clip(max=max(len(shared_keys) - 1, 0))
+        weights = np.where(shared_keys[found] == edges, common_blocks[found], 0).astype(np.float64) \
+            if len(shared_keys) else np.zeros(len(edges))
+
+        row1, row2 = np.divmod(edges, max(num_rows, 1))
+        if scheme == 'jaccard':
+            record_blocks = np.bincount(records, minlength=num_rows)
+            weights = weights / np.maximum(record_blocks[row1] + record_blocks[row2] - weights, 1)
+
+        # An edge survives if it is among the top_k heaviest edges of either
+        # of its records; ties are broken by pair order.
+        nodes = np.concatenate((row1, row2))
+        edge_index = np.tile(np.arange(len(edges)), 2)
+        order = np.lexsort((edge_index, -np.tile(weights, 2), nodes))
+        nodes, edge_index = nodes[order], edge_index[order]
+        rank = np.arange(len(nodes)) - np.searchsorted(nodes, nodes)
+        keep = np.unique(edge_index[rank < top_k])
+
+        self.candidate_pairs = CandidatePairs.from_keys(edges[keep], num_rows)
+
+    def _block_memberships(self):
+        # (records, labels) listing every block each record belongs to; pair
+        # based methods contribute one block per anchor with its partners.
+        if self.block_memberships is not None:
+            return self.block_memberships
+
+        num_rows = len(self.blocks)
+        if self.candidate_pairs is None:
+            records = [np.arange(num_rows)]
+            labels = [pd.factorize(self.blocks['block_id'])[0]]
+        else:
+            records = [np.arange(num_rows), self.candidate_pairs.row2.astype(np.int64)]
+            labels = [np.arange(num_rows), self.candidate_pairs.row1.astype(np.int64)]
+
+        # With several key columns, agreeing on a single column key counts as
+        # sharing a block as well.
+        columns = self.parameters.get('columns') or []
+        if self.method == 'standardBlocking' and len(columns) > 1:
+            for col in columns:
+                keys = self._column_keys(self.blocks[col], soundex).to_numpy()
+                codes, _ = pd.factorize(keys)
+                nonempty = np.flatnonzero(keys != '')
+                records.append(nonempty)
+                labels.append(codes[nonempty] + max((int(label.max()) + 1 for label in labels if len(label)), default=0))
+
+        return np.concatenate(records), np.concatenate(labels)
+
+    def estimate_cost(self, column_algorithms=None, sample_size=1000, num_largest=10, seed=0):
+        if self.blocks is None:
+            raise ValueError("No blocks have been generated. Run block building first.")
+
+        num_records = len(self.blocks)
+        total_pairs = int(self._cross_pairs(np.zeros(num_records, dtype=np.int64), 1).sum())
+        if self.candidate_pairs is not None:
+            # Pair-based methods have no disjoint blocks to report, only pairs.
+            num_pairs = len(self.candidate_pairs)
+            estimate = {'num_records': num_records, 'num_pairs': num_pairs, 'total_pairs': total_pairs}
+        else:
+            block_codes, blocks = pd.factorize(self.blocks['block_id'].to_numpy())
+            block_sizes = np.bincount(block_codes, minlength=len(blocks)).astype(np.int64)
+            block_pairs = self._cross_pairs(block_codes, len(blocks))
+            num_pairs = int(block_pairs.sum())
+            sizes, counts = np.unique(block_sizes, return_counts=True)
+            largest = np.argsort(-block_pairs, kind='stable')[:num_largest]
+
+            estimate = {
+                'num_records': num_records,
+                'num_blocks': int(len(blocks)),
+                'num_pairs': num_pairs,
+                'total_pairs': total_pairs,
+                'block_size_histogram': [{'size': int(size), 'blocks': int(count)}
+                                         for size, count in zip(sizes, counts)],
+                'largest_blocks': [
+                    {'block_id': blocks[block].item(), 'size': int(block_sizes[block]),
+                     'pairs': int(block_pairs[block])}
+                    for block in largest
+                ],
+            }
+        estimate['reduction_ratio'] = round(1 - num_pairs / total_pairs, 6) if total_pairs else 0.0
+
+        sample = self._sample_pairs(min(sample_size, num_pairs), seed) if column_algorithms and num_pairs else None
+        if sample is not None and len(sample):
+            records = np.unique(np.concatenate((sample.row1, sample.row2)))
+            sample = CandidatePairs(np.searchsorted(records, sample.row1), np.searchsorted(records, sample.row2))
+
+            seconds_per_pair = {}
+            for col, comparison_func in column_algorithms.items():
+                values = self.blocks[col].to_numpy(dtype=object)[records]
+                start = time.perf_counter()
+                Comparison._compare_column(comparison_func, values, sample)
+                seconds_per_pair[col] = (time.perf_counter() - start) / len(sample)
+
+            estimate['sampled_pairs'] = len(sample)
+            estimate['seconds_per_pair'] = seconds_per_pair
+            estimate['estimated_seconds'] = round(sum(seconds_per_pair.values()) * num_pairs, 3)
+
+        return estimate
+
+    def _cross_pairs(self, block_codes, num_blocks):
+        # Pairs per block: n * (n - 1) / 2, minus the same-source pairs when
+        # linking sources.
+        block_sizes = np.bincount(block_codes, minlength=num_blocks).astype(np.int64)
+        pairs = block_sizes * (block_sizes - 1) // 2
+        if self.source_column is not None:
+            source_codes, sources = pd.factorize(self.blocks[self.source_column])
+            same_source = np.bincount(block_codes * max(len(sources), 1) + source_codes,
+                                      minlength=num_blocks * max(len(sources), 1)).astype(np.int64)
+            pairs -= (same_source * (same_source - 1) // 2).reshape(num_blocks, -1).sum(axis=1)
+        return pairs
+
+    def _sample_pairs(self, sample_size, seed):
+        # Pairs are drawn uniformly from all candidate pairs without building
+        # them: a block is chosen in proportion to its pairs, then two members.
+        rng = np.random.default_rng(seed)
+        if self.candidate_pairs is not None:
+            chosen = rng.integers(len(self.candidate_pairs), size=sample_size)
+            return CandidatePairs(self.candidate_pairs.row1[chosen], self.candidate_pairs.row2[chosen])
+
+        block_codes, _ = pd.factorize(self.blocks['block_id'].to_numpy())
+        order = np.argsort(block_codes, kind='stable')
+        block_sizes = np.bincount(block_codes)
+        starts = np.concatenate(([0], np.cumsum(block_sizes)[:-1]))
+
+        # Blocks are weighted by all their pairs; when linking, same-source
+        # draws are rejected, which leaves the cross-source pairs uniform.
+        all_pairs = block_sizes * (block_sizes - 1) // 2
+        sampled = CandidatePairs([], [])
+        for _ in range(10):
+            blocks = rng.choice(len(all_pairs), size=sample_size, p=all_pairs / all_pairs.sum())
+            first = rng.integers(block_sizes[blocks])
+            second = rng.integers(block_sizes[blocks] - 1)
+            second += second >= first
+            pairs = CandidatePairs(order[starts[blocks] + first], order[starts[blocks] + second])
+            if self.source_column is not None:
+                pairs = pairs.cross_source(self.blocks[self.source_column])
+            sampled = CandidatePairs(np.concatenate((sampled.row1, pairs.row1))[:sample_size],
+                                     np.concatenate((sampled.row2, pairs.row2))[:sample_size])
+            if len(sampled) == sample_size:
+                break
+        return sampled
+
+    def get_candidate_pairs(self):
+        if self.blocks is None:
+            raise ValueError("No blocks have been generated. Run block building first.")
+
+        if self.candidate_pairs is None:
+            pairs = CandidatePairs.from_block_ids(self.blocks['block_id'].to_numpy())
+            if self.source_column is not None:
+                pairs = pairs.cross_source(self.blocks[self.source_column])
+            return pairs
+        return self.candidate_pairs
+
     def get_num_blocks(self):
         return self.num_blocks
 
@@ -115,6 +859,11 @@ class BlockBuilding:
         if self.blocks is None:
             raise ValueError("No blocks have been generated. Run block building first.")
 
+        if self.candidate_pairs is not None:
+            anchors = np.flatnonzero(self.blocks['block_id'].to_numpy() == block_index)
+            partners = self.candidate_pairs.row2[np.isin(self.candidate_pairs.row1, anchors)]
+            return self.blocks.iloc[np.concatenate((anchors, partners))]
+
         return self.blocks[self.blocks['block_id'] == block_index]
 
     def get_blocks(self):
@@ -124,5 +873,8 @@ class BlockBuilding:
         return self.blocks
 
     def dataframe_to_jsonb(self):
-        json_data = self.blocks.to_json(orient='records', date_format='iso')
+        blocks = self.blocks
+        if self.candidate_pairs is not None or self.source_column is not None:
+            blocks = blocks.assign(candidates=self.get_candidate_pairs().to_candidates(blocks['ID']))
+        json_data = blocks.to_json(orient='records', date_format='iso')
         return json.loads(json_data)
\ No newline at end of file
@@ -0,0 +1,54 @@
+import pandas as pd
+import numpy as np
+from jellyfish import soundex
+from .BlockBuilding import BlockBuilding
+
+
+class BlockingIndex:
+    def __init__(self, columns, buckets=None):
+        if not columns:
+            raise ValueError("You must specify the columns for generating keys.")
+
+        self.columns = columns
+        self.buckets = buckets if buckets is not None else {}
+
+    def block_keys(self, data):
+        # Same blocking key values as standard blocking on these columns.
+        keys = [BlockBuilding._column_keys(data[col], soundex) for col in self.columns]
+        return keys[0].str.cat(keys[1:], sep=' ') if len(keys) > 1 else keys[0]
+
+    def build(self, data):
+        self.buckets = {}
+        self._insert(data)
+        return self.buckets
+
+    def add_records(self, data):
+        # Only the buckets of the new records' keys are read, so the pairs
+        # produced here are exactly the ones a full rebuild would add.
+        first_ids, second_ids = [], []
+        for key, new_ids in self._grouped_ids(data):
+            existing_ids = np.asarray(self.buckets.get(key, []), dtype=object)
+            first_ids.append(np.repeat(existing_ids, len(new_ids)))
+            second_ids.append(np.tile(new_ids, len(existing_ids)))
+
+            first, second = np.triu_indices(len(new_ids), 1)
+            first_ids.append(new_ids[first])
+            second_ids.append(new_ids[second])
+
+        self._insert(data)
+
+        return pd.DataFrame({
+            'ID1': np.concatenate(first_ids) if first_ids else np.empty(0, dtype=object),
+            'ID2': np.concatenate(second_ids) if second_ids else np.empty(0, dtype=object),
+        })
+
+    def _insert(self, data):
+        for key, new_ids in self._grouped_ids(data):
+            self.buckets[key] = self.buckets.get(key, []) + new_ids.tolist()
+
+    def _grouped_ids(self, data):
+        if 'ID' not in data.columns:
+            raise ValueError("Records must have an 'ID' column to be indexed.")
+
+        ids = pd.Series(data['ID'].to_numpy(dtype=object), index=self.block_keys(data).to_numpy())
+        return [(key, group.to_numpy(dtype=object)) for key, group in ids.groupby(level=0, sort=False)]
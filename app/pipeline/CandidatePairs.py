@@ -0,0 +1,88 @@
+import pandas as pd
+import numpy as np
+
+# Reserved columns of a linkage run over two sources: the source of each
+# record ('master' or 'linked') and its ID within that source.
+SOURCE_COLUMN = '__source__'
+SOURCE_ID_COLUMN = '__source_id__'
+
+
+class CandidatePairs:
+    def __init__(self, row1, row2):
+        self.row1 = np.asarray(row1, dtype=np.int32)
+        self.row2 = np.asarray(row2, dtype=np.int32)
+
+    def __len__(self):
+        return len(self.row1)
+
+    @classmethod
+    def from_block_ids(cls, block_ids):
+        codes, _ = pd.factorize(pd.Series(block_ids), sort=True)
+        positions = np.flatnonzero(codes >= 0)
+        if len(positions) == 0:
+            return cls([], [])
+
+        # Rows of each block become one contiguous slice of `order`.
+        order = positions[np.argsort(codes[positions], kind='stable')]
+        sizes = np.bincount(codes[positions])
+        starts = np.concatenate(([0], np.cumsum(sizes)[:-1]))
+
+        row1_parts, row2_parts, block_parts = [], [], []
+        for size in np.unique(sizes[sizes > 1]):
+            first, second = np.triu_indices(size, 1)
+            blocks = np.flatnonzero(sizes == size)
+            block_starts = starts[blocks][:, None]
+            row1_parts.append((block_starts + first).ravel())
+            row2_parts.append((block_starts + second).ravel())
+            block_parts.append(np.repeat(blocks, len(first)))
+
+        if not row1_parts:
+            return cls([], [])
+
+        # Pairs were generated per block size; restore block order without
+        # disturbing the combinations order inside each block.
+        by_block = np.argsort(np.concatenate(block_parts), kind='stable')
+        row1 = order[np.concatenate(row1_parts)[by_block]]
+        row2 = order[np.concatenate(row2_parts)[by_block]]
+        return cls(row1, row2)
+
+    @classmethod
+    def from_candidates(cls, ids, candidates):
+        # Inverse of to_candidates: each row lists the IDs of its partners.
+        candidates = pd.Series(list(candidates), dtype=object).explode().dropna()
+        row2 = pd.Index(ids).get_indexer(candidates.to_numpy())
+        if (row2 < 0).any():
+            raise ValueError("Candidate pairs reference IDs that are not in the data.")
+        return cls(candidates.index.to_numpy(), row2)
+
+    def to_candidates(self, ids):
+        ids = np.asarray(ids, dtype=object)
+        if len(ids) == 0:
+            return []
+        order = np.argsort(self.row1, kind='stable')
+        partners = ids[self.row2[order]]
+        bounds = np.searchsorted(self.row1[order], np.arange(1, len(ids)))
+        return [part.tolist() for part in np.split(partners, bounds)]
+
+    def cross_source(self, sources):
+        # Record linkage: keep only pairs whose records come from different sources.
+        sources = np.asarray(sources, dtype=object)
+        keep = sources[self.row1] != sources[self.row2]
+        return CandidatePairs(self.row1[keep], self.row2[keep])
+
+    def keys(self, num_rows, return_counts=False):
+        # One sorted int64 key per unordered pair; duplicates are dropped.
+        row1 = self.row1.astype(np.int64)
+        row2 = self.row2.astype(np.int64)
+        return np.unique(np.minimum(row1, row2) * max(num_rows, 1) + np.maximum(row1, row2),
+                         return_counts=return_counts)
+
+    @classmethod
+    def from_keys(cls, keys, num_rows):
+        row1, row2 = np.divmod(keys, max(num_rows, 1))
+        return cls(row1, row2)
+
+    @classmethod
+    def union(cls, pairs_list, num_rows):
+        keys = [pairs.keys(num_rows) for pairs in pairs_list]
+        return cls.from_keys(np.unique(np.concatenate(keys)) if keys else np.empty(0, dtype=np.int64), num_rows)
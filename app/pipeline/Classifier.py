@@ -2,25 +2,40 @@ import pandas as pd
 import numpy as np
 import json
 
+# Scores added by classification itself; a saved classification result carries
+# them next to the per-field similarities of the comparison step.
+DERIVED_SIMILARITY_COLUMNS = ('average_similarity', 'weighted_similarity', 'normalized_similarity')
+
 
 class Classifier:
     def __init__(self, blocked_data, comparison_table):
         self.blocked_data = blocked_data
         self.comparison_table = comparison_table
         self.classification_results = None  # To store classification results
+        self.state = None
+        self.id_index = None
 
     def classify_matches(self, method='threshold_based', thresholds=None, weights=None, possible_match=False,
-                         costs=None, probabilities=None):
+                         costs=None, probabilities=None, levels=None, max_iterations=100, state=None):
+        # `state` is the fitted_state() of an earlier run; methods fitted to
+        # the whole population (weighted, fellegi_sunter) reuse it instead of
+        # fitting again, so a few pairs are classified as in the full run.
 
         self.method = method
+        self.state = {}
         self.parameters = {
             'thresholds': thresholds,
             'weights': weights,
             'possible_match': possible_match,
             'costs': costs,
             'probabilities': probabilities,
+            'levels': levels,
         }
 
+        if method != 'threshold_based' and self._has_pruned_pairs():
+            raise ValueError("Pruned comparisons can only be classified threshold-based; "
+                             "compare again without pruning.")
+
         if method == 'threshold_based':
             if thresholds is None:
                 raise ValueError("Thresholds must be provided for threshold-based classification.")
@@ -29,31 +44,50 @@ class Classifier:
         elif method == 'weighted':
             if thresholds is None or weights is None:
                 raise ValueError("Both thresholds and weights must be provided for weighted classification.")
-            self.classification_results = self._weighted_classification(thresholds, weights)
+            self.classification_results = self._weighted_classification(thresholds, weights, state)
 
         elif method == 'cost_based':
             if costs is None or probabilities is None:
                 raise ValueError("Costs and probabilities must be provided for cost-based classification.")
             self.classification_results = self._cost_based_classification(costs, probabilities)
 
+        elif method == 'fellegi_sunter':
+            if state is not None:
+                levels = state['levels']
+            levels = sorted(levels) if levels is not None else [0.5, 0.8]
+            if not levels or levels[0] <= 0 or levels[-1] > 1:
+                raise ValueError("Agreement levels must be cut points in (0, 1].")
+            if max_iterations < 1:
+                raise ValueError("At least one EM iteration is required.")
+            self.classification_results = self._fellegi_sunter_classification(
+                levels, thresholds or {'match': 0.5}, possible_match, max_iterations, state)
+
         else:
             raise ValueError(f"Unknown classification method: {method}")
 
         return self.classification_results
 
     def _threshold_based_classification(self, thresholds, possible_match):
-        merged_data = self._merge_row_details()
-        similarity_columns = [col for col in self.comparison_table.columns if col.endswith('_similarity')]
-        merged_data['average_similarity'] = merged_data[similarity_columns].mean(axis=1)
+        if self._has_pruned_pairs():
+            # Pruned pairs average below the prune threshold; they are only
+            # 'Not Match' for sure while the thresholds are not lower.
+            prune_threshold = self._prune_threshold()
+            lowest = thresholds['not_match'] if possible_match else thresholds['match']
+            if lowest < prune_threshold:
+                raise ValueError(f"Thresholds below the prune threshold ({prune_threshold}) would mislabel pruned "
+                                 "pairs; compare again with a lower prune threshold.")
 
-        merged_data['classification'] = merged_data['average_similarity'].apply(
-            lambda similarity: self._classify_by_thresholds(similarity, thresholds, possible_match)
-        )
-        return merged_data
+        merged_data = self._similarity_table()
+        similarity_columns = self._similarity_columns()
+        merged_data['average_similarity'] = self._average_similarity(merged_data, similarity_columns)
+
+        merged_data['classification'] = self._classify_by_thresholds(
+            merged_data['average_similarity'].to_numpy(), thresholds, possible_match)
+        return self._label_pruned_pairs(merged_data, 'Not Match')
 
-    def _weighted_classification(self, thresholds, weights):
-        merged_data = self._merge_row_details()
-        similarity_columns = [col for col in self.comparison_table.columns if col.endswith('_similarity')]
+    def _weighted_classification(self, thresholds, weights, state=None):
+        merged_data = self._similarity_table()
+        similarity_columns = self._similarity_columns()
 
         if not set(weights.keys()).issubset(set(similarity_columns)):
             raise ValueError("All keys in weights must match similarity columns.")
@@ -62,67 +96,313 @@ class Classifier:
             merged_data[col] * weight for col, weight in weights.items()
         )
 
-        min_similarity = merged_data['weighted_similarity'].min()
-        max_similarity = merged_data['weighted_similarity'].max()
+        if state is None:
+            min_similarity = merged_data['weighted_similarity'].min()
+            max_similarity = merged_data['weighted_similarity'].max()
+        else:
+            min_similarity, max_similarity = state['min_similarity'], state['max_similarity']
         merged_data['normalized_similarity'] = (
-            (merged_data['weighted_similarity'] - min_similarity) /
-            (max_similarity - min_similarity)
+            ((merged_data['weighted_similarity'] - min_similarity) /
+             (max_similarity - min_similarity)).clip(0, 1)
             if max_similarity > min_similarity else 0
         )
+        # Kept also when every score is equal, so lookups apply the same
+        # degenerate scaling; only an empty batch has nothing to keep.
+        if not pd.isna(min_similarity):
+            self.state = {'min_similarity': float(min_similarity), 'max_similarity': float(max_similarity)}
 
-        merged_data['classification'] = merged_data['normalized_similarity'].apply(
-            lambda similarity: 'Match' if similarity >= thresholds['match'] else 'Non-Match'
-        )
+        matches = merged_data['normalized_similarity'].to_numpy() >= thresholds['match']
+        merged_data['classification'] = self._labels(matches, ['Non-Match', 'Match'])
 
         return merged_data
 
     def _cost_based_classification(self, costs, probabilities):
-        merged_data = self._merge_row_details()
-        similarity_columns = [col for col in self.comparison_table.columns if col.endswith('_similarity')]
-        merged_data['average_similarity'] = merged_data[similarity_columns].mean(axis=1)
+        merged_data = self._similarity_table()
+        similarity_columns = self._similarity_columns()
+        merged_data['average_similarity'] = self._average_similarity(merged_data, similarity_columns)
 
         P_M = probabilities['M']
         P_U = probabilities['U']
+        similarity = merged_data['average_similarity'].to_numpy()
         merged_data['cost_non_match'] = (
-                costs['non_match_true_match'] * merged_data['average_similarity'] * P_M +
-                costs['non_match_true_non_match'] * (1 - merged_data['average_similarity']) * P_U
+                costs['non_match_true_match'] * similarity * P_M +
+                costs['non_match_true_non_match'] * (1 - similarity) * P_U
         )
         merged_data['cost_match'] = (
-                costs['match_true_match'] * merged_data['average_similarity'] * P_M +
-                costs['match_true_non_match'] * (1 - merged_data['average_similarity']) * P_U
+                costs['match_true_match'] * similarity * P_M +
+                costs['match_true_non_match'] * (1 - similarity) * P_U
         )
 
-        merged_data['classification'] = merged_data.apply(
-            lambda row: 'Match' if row['cost_match'] < row['cost_non_match'] else 'Non-Match',
-            axis=1
-        )
+        matches = merged_data['cost_match'].to_numpy() < merged_data['cost_non_match'].to_numpy()
+        merged_data['classification'] = self._labels(matches, ['Non-Match', 'Match'])
+
+        return merged_data
+
+    def _fellegi_sunter_classification(self, levels, thresholds, possible_match, max_iterations, state=None,
+                                       tolerance=1e-6):
+        merged_data = self._similarity_table()
+        similarity_columns = self._similarity_columns()
+        if not similarity_columns:
+            raise ValueError("No similarity columns found for Fellegi-Sunter classification.")
 
+        # Each similarity becomes an agreement level: 0 below the first cut
+        # point, up to len(levels) at or above the last; missing scores get a
+        # level of their own.
+        num_levels = len(levels) + 2
+        agreement = np.empty((len(merged_data), len(similarity_columns)), dtype=np.int64)
+        for i, col in enumerate(similarity_columns):
+            scores = merged_data[col].to_numpy(dtype=np.float64)
+            agreement[:, i] = np.where(np.isnan(scores), num_levels - 1,
+                                       np.searchsorted(levels, np.nan_to_num(scores), side='right'))
+
+        # EM runs on the distinct comparison vectors, weighted by their counts.
+        if num_levels ** len(similarity_columns) < 2 ** 62:
+            radix = num_levels ** np.arange(len(similarity_columns), dtype=np.int64)
+            codes, inverse, counts = np.unique(agreement @ radix, return_inverse=True, return_counts=True)
+            patterns = codes[:, None] // radix % num_levels
+        else:
+            patterns, inverse, counts = np.unique(agreement, axis=0, return_inverse=True, return_counts=True)
+        inverse = inverse.ravel()
+        column_offsets = np.arange(len(similarity_columns)) * num_levels
+        cells = patterns + column_offsets
+
+        if state is not None:
+            if set(state['m_probabilities']) != set(similarity_columns):
+                raise ValueError("The fitted estimates do not cover the same similarity columns.")
+            m = np.concatenate([state['m_probabilities'][col] for col in similarity_columns])
+            u = np.concatenate([state['u_probabilities'][col] for col in similarity_columns])
+            prevalence, iteration = state['prevalence'], 0
+        else:
+            m, u, prevalence, iteration = self._fellegi_sunter_estimates(
+                cells, counts, num_levels, len(similarity_columns), max_iterations, tolerance)
+
+        pattern_weights = (np.log2(m) - np.log2(u))[cells].sum(axis=1)
+        log_odds = np.log(prevalence) - np.log(1 - prevalence) + pattern_weights * np.log(2)
+        pattern_probabilities = 1 / (1 + np.exp(-np.clip(log_odds, -700, 700)))
+
+        merged_data['match_weight'] = pattern_weights[inverse]
+        merged_data['match_probability'] = pattern_probabilities[inverse]
+        probability = merged_data['match_probability'].to_numpy()
+        if possible_match:
+            codes = np.where(probability < thresholds.get('not_match', 0.5), 0,
+                             2 - (probability < thresholds['match']))
+        else:
+            codes = np.where(probability < thresholds['match'], 0, 2)
+        merged_data['classification'] = self._labels(codes, ['Non-Match', 'Possible Match', 'Match'])
+
+        self.parameters.update({
+            'prevalence': float(prevalence),
+            'm_probabilities': {col: m[i * num_levels:(i + 1) * num_levels].tolist()
+                                for i, col in enumerate(similarity_columns)},
+            'u_probabilities': {col: u[i * num_levels:(i + 1) * num_levels].tolist()
+                                for i, col in enumerate(similarity_columns)},
+            'iterations': iteration,
+            'num_patterns': len(patterns),
+        })
+        self.state = {key: self.parameters[key] for key in ('prevalence', 'm_probabilities', 'u_probabilities')}
+        self.state['levels'] = list(levels)
         return merged_data
 
-    def _merge_row_details(self):
-        row1_details = self.blocked_data.set_index('ID').loc[self.comparison_table['row1']].reset_index(drop=True)
-        row2_details = self.blocked_data.set_index('ID').loc[self.comparison_table['row2']].reset_index(drop=True)
+    def threshold_sweep(self, weights=None, true_matches=None):
+        # One sort of the aggregate similarity gives the match count at every
+        # threshold: all pairs scoring at or above it. The aggregate is the
+        # one threshold_based (average) or weighted (normalized) compares.
+        merged_data = self._similarity_table()
+        similarity_columns = self._similarity_columns()
+        if weights is None:
+            scores = self._average_similarity(merged_data, similarity_columns)
+        else:
+            if not weights or not set(weights.keys()).issubset(set(similarity_columns)):
+                raise ValueError("All keys in weights must match similarity columns.")
+            if self._has_pruned_pairs():
+                raise ValueError("Pruned comparisons can only be swept without weights; "
+                                 "compare again without pruning.")
+            scores = sum(merged_data[col].to_numpy(dtype=np.float64) * weight for col, weight in weights.items())
+            min_similarity, max_similarity = np.nanmin(scores, initial=np.inf), np.nanmax(scores, initial=-np.inf)
+            scores = (scores - min_similarity) / (max_similarity - min_similarity) \
+                if max_similarity > min_similarity else np.zeros(len(scores))
+
+        # Pruned pairs and pairs without a score never become matches.
+        scored = ~np.isnan(scores)
+        if 'pruned' in merged_data.columns:
+            scored &= ~merged_data['pruned'].to_numpy(dtype=bool)
+        order = np.argsort(-scores[scored])
+        sorted_scores = scores[scored][order]
+        last = np.append(np.flatnonzero(np.diff(sorted_scores)), len(sorted_scores) - 1)[:len(sorted_scores)]
+        sweep = pd.DataFrame({'threshold': sorted_scores[last], 'matches': last + 1})
+        if self._has_pruned_pairs():
+            # Below the prune threshold the skipped pairs would count as well.
+            sweep = sweep[sweep['threshold'] >= self._prune_threshold()]
+            last = last[:len(sweep)]
+
+        if true_matches is not None:
+            is_true, num_true = self._true_match_flags(merged_data, true_matches)
+            true_positives = np.cumsum(is_true[scored][order])[last] if len(last) else np.empty(0)
+            sweep['true_positives'] = true_positives
+            sweep['precision'] = true_positives / sweep['matches']
+            sweep['recall'] = true_positives / num_true if num_true else 0.0
+            sweep['f1'] = np.divide(2 * true_positives, sweep['matches'] + num_true,
+                                    out=np.zeros(len(sweep)), where=(sweep['matches'] + num_true) > 0)
+        return sweep
 
-        merged_data = self.comparison_table.copy()
-        for col in self.blocked_data.columns:
-            if col not in ['block_id', 'SKV', 'BKV', 'ID']:  # Exclude metadata columns
-                merged_data[f'row1_{col}'] = row1_details[col].values
-                merged_data[f'row2_{col}'] = row2_details[col].values
+    @staticmethod
+    def _true_match_flags(merged_data, true_matches):
+        true_matches = pd.DataFrame(list(true_matches), columns=['row1', 'row2'])
+        true_matches = true_matches[true_matches['row1'] != true_matches['row2']]
+        true_ids = pd.unique(pd.concat([true_matches['row1'], true_matches['row2']], ignore_index=True))
+
+        # Only pairs made of two ground-truth IDs can be true matches; those
+        # are compared as unordered int64 keys over shared ID codes.
+        candidates = np.flatnonzero(merged_data['row1'].isin(true_ids).to_numpy() &
+                                    merged_data['row2'].isin(true_ids).to_numpy())
+        ids = pd.Index(true_ids)
+        num_ids = max(len(ids), 1)
+        row1 = ids.get_indexer(merged_data['row1'].to_numpy()[candidates]).astype(np.int64)
+        row2 = ids.get_indexer(merged_data['row2'].to_numpy()[candidates]).astype(np.int64)
+        true1 = ids.get_indexer(true_matches['row1']).astype(np.int64)
+        true2 = ids.get_indexer(true_matches['row2']).astype(np.int64)
+        true_keys = np.unique(np.minimum(true1, true2) * num_ids + np.maximum(true1, true2))
+
+        is_true = np.zeros(len(merged_data), dtype=bool)
+        is_true[candidates] = np.isin(np.minimum(row1, row2) * num_ids + np.maximum(row1, row2), true_keys)
+        return is_true, len(true_keys)
+
+    def _fellegi_sunter_estimates(self, cells, counts, num_levels, num_columns, max_iterations, tolerance):
+        # Start with matches leaning to the high levels and non-matches to the
+        # low ones; the missing level is neutral.
+        ramp = np.arange(1, num_levels, dtype=np.float64)
+        m = np.tile(np.append(ramp, ramp.mean()) / (ramp.sum() + ramp.mean()), num_columns)
+        u = np.tile(np.append(ramp[::-1], ramp.mean()) / (ramp.sum() + ramp.mean()), num_columns)
+        prevalence = 0.1
+        for iteration in range(1, max_iterations + 1):
+            log_m = np.log(m)[cells].sum(axis=1)
+            log_u = np.log(u)[cells].sum(axis=1)
+            posterior = 1 / (1 + np.exp(np.clip(np.log(1 - prevalence) + log_u - np.log(prevalence) - log_m,
+                                                -700, 700)))
+
+            match_counts = counts * posterior
+            non_match_counts = counts - match_counts
+            new_prevalence = match_counts.sum() / counts.sum()
+            new_m = np.bincount(cells.ravel(), weights=np.repeat(match_counts, num_columns),
+                                minlength=m.size) / max(match_counts.sum(), 1e-12)
+            new_u = np.bincount(cells.ravel(), weights=np.repeat(non_match_counts, num_columns),
+                                minlength=u.size) / max(non_match_counts.sum(), 1e-12)
+            new_m = self._normalized_levels(np.clip(new_m, 1e-6, None), num_levels)
+            new_u = self._normalized_levels(np.clip(new_u, 1e-6, None), num_levels)
+            new_prevalence = min(max(new_prevalence, 1e-6), 1 - 1e-6)
+
+            change = max(np.abs(new_m - m).max(), np.abs(new_u - u).max(), abs(new_prevalence - prevalence))
+            m, u, prevalence = new_m, new_u, new_prevalence
+            if change < tolerance:
+                break
+
+        # The match class is the one that puts more weight on the highest level.
+        top = np.arange(num_columns) * num_levels + num_levels - 2
+        if m[top].sum() < u[top].sum():
+            m, u, prevalence = u, m, 1 - prevalence
+
+        return m, u, prevalence, iteration
+
+    @staticmethod
+    def _normalized_levels(probabilities, num_levels):
+        levels = probabilities.reshape(-1, num_levels)
+        return (levels / levels.sum(axis=1, keepdims=True)).ravel()
+
+    def _similarity_columns(self):
+        return [col for col in self.comparison_table.columns
+                if col.endswith('_similarity') and col not in DERIVED_SIMILARITY_COLUMNS]
+
+    def _compared_columns(self):
+        columns = [col[:-len('_similarity')] for col in self._similarity_columns()]
+        return [col for col in columns if col in self.blocked_data.columns]
+
+    def _similarity_table(self):
+        # Classification only reads the pair ids and the scores; the record
+        # details are joined later, for the pairs that are returned.
+        similarity_columns = self._similarity_columns()
+        columns = [
+            col for col in self.comparison_table.columns
+            if col in ('block_id', 'row1', 'row2', 'pruned') or col in similarity_columns
+        ]
+        return pd.DataFrame({col: self.comparison_table[col].to_numpy() for col in columns})
+
+    def row_details(self, pairs=None, columns=None):
+        if pairs is None:
+            pairs = self.get_classification_results()
+        if columns is None:
+            columns = [
+                col for col in self.blocked_data.columns
+                if col not in ['block_id', 'SKV', 'BKV', 'ID', 'candidates']  # Exclude metadata columns
+            ]
+
+        missing_columns = [col for col in columns if col not in self.blocked_data.columns]
+        if missing_columns:
+            raise ValueError(f"Columns not found in the blocked data: {', '.join(missing_columns)}.")
+
+        if self.id_index is None:
+            self.id_index = pd.Index(self.blocked_data['ID'])
+        row1 = self.id_index.get_indexer(pairs['row1'])
+        row2 = self.id_index.get_indexer(pairs['row2'])
+        if (row1 < 0).any() or (row2 < 0).any():
+            raise ValueError("Compared pairs reference IDs that are not in the blocked data.")
+
+        details = {}
+        for col in columns:
+            values = self.blocked_data[col].to_numpy()
+            details[f'row1_{col}'] = values[row1]
+            details[f'row2_{col}'] = values[row2]
+        return pairs.assign(**details)
+
+    def _has_pruned_pairs(self):
+        # Pruning is bounded on the plain average of the scores; methods that
+        # fit to or rescale over all pairs cannot label the skipped ones.
+        return 'pruned' in self.comparison_table.columns and self.comparison_table['pruned'].astype(bool).any()
+
+    def _prune_threshold(self):
+        if 'prune_threshold' not in self.comparison_table.columns:
+            raise ValueError("Pruned comparisons need their prune threshold; compare again.")
+        return float(self.comparison_table['prune_threshold'].iloc[0])
+
+    @staticmethod
+    def _label_pruned_pairs(merged_data, label):
+        # Pairs pruned during comparison could not reach the match threshold.
+        if 'pruned' in merged_data.columns:
+            merged_data.loc[merged_data['pruned'].astype(bool), 'classification'] = label
         return merged_data
 
     def _classify_by_thresholds(self, similarity, thresholds, possible_match):
         if possible_match:
-            if similarity < thresholds['not_match']:
-                return 'Not Match'
-            elif thresholds['not_match'] <= similarity < thresholds['match']:
-                return 'Possible Match'
-            else:
-                return 'Match'
-        else:
-            if similarity < thresholds['match']:
-                return 'Not Match'
+            codes = np.where(similarity < thresholds['not_match'], 0, 2 - (similarity < thresholds['match']))
+            return self._labels(codes, ['Not Match', 'Possible Match', 'Match'])
+        return self._labels(~(similarity < thresholds['match']), ['Not Match', 'Match'])
+
+    @staticmethod
+    def _average_similarity(merged_data, similarity_columns):
+        # Mean over the scored columns of each pair, skipping missing scores.
+        total = np.zeros(len(merged_data))
+        counts = np.zeros(len(merged_data))
+        for col in similarity_columns:
+            scores = merged_data[col].to_numpy(dtype=np.float64)
+            scored = ~np.isnan(scores)
+            if scored.all():
+                total += scores
+                counts += 1
             else:
-                return 'Match'
+                total += np.where(scored, scores, 0)
+                counts += scored
+        return np.divide(total, counts, out=np.full(len(merged_data), np.nan), where=counts > 0)
+
+    @staticmethod
+    def _labels(codes, categories):
+        # Labels are kept as int8 codes of a categorical column.
+        return pd.Categorical.from_codes(np.asarray(codes, dtype=np.int8), categories=categories)
+
+    def fitted_state(self):
+        # What classify_matches(state=...) needs to classify new pairs the
+        # way this run did; empty for methods that fit nothing.
+        if self.state is None:
+            raise ValueError("No classification results available. Run 'classify_matches' first.")
+        return self.state
 
     def get_classification_results(self):
         if self.classification_results is None:
@@ -135,6 +415,10 @@ class Classifier:
     def used_parameters(self):
         return self.parameters
 
-    def dataframe_to_jsonb(self):
-        json_data = self.classification_results.to_json(orient='records', date_format='iso')
+    def dataframe_to_jsonb(self, detail_columns=None):
+        # Saved results carry only the compared fields; the other record
+        # details are joined with row_details() when the pairs are shown.
+        if detail_columns is None:
+            detail_columns = self._compared_columns()
+        json_data = self.row_details(columns=detail_columns).to_json(orient='records', date_format='iso')
         return json.loads(json_data)
@@ -2,16 +2,39 @@ import pandas as pd
 import numpy as np
 from fuzzywuzzy import fuzz
 from jellyfish import soundex
-import itertools
+from rapidfuzz.distance import Levenshtein, JaroWinkler
+from rapidfuzz.process import cpdist
 import json
+from functools import partial
+from .CandidatePairs import CandidatePairs
+from .ParallelComparison import compare_in_processes
+from .SimilarityCache import SimilarityCache
+
+
+class BatchComparator:
+    batched = True
+
+    def __init__(self, func, **options):
+        self.func = func
+        self.options = options
+        self.__name__ = func.__name__
+
+    def __call__(self, values, pairs):
+        return self.func(values, pairs, **self.options)
 
 
 class Comparison:
-    def __init__(self, data):
+    def __init__(self, data, cache_size=100000, cache=None):
         self.data = data
         self.comparison_results = None
         self.methods = {}
         self.parameters = {}
+        # An explicit cache (e.g. SimilarityCache.shared()) outlives this
+        # comparison; otherwise one of cache_size entries is made for it.
+        if cache is None and cache_size:
+            cache = SimilarityCache(cache_size)
+        self.cache = cache
+        self.cache_start = cache.counters() if cache is not None else None
 
     @staticmethod
     def levenshtein_similarity(str1, str2):
@@ -19,7 +42,6 @@ class Comparison:
             return 0
         str1 = str(str1)
         str2 = str(str2)
-        from rapidfuzz.distance import Levenshtein
         score = Levenshtein.normalized_similarity(str1, str2)
         return max(0, min(1, score))
 
@@ -29,10 +51,35 @@ class Comparison:
             return 0
         str1 = str(str1)
         str2 = str(str2)
-        from rapidfuzz.distance import JaroWinkler
         score = JaroWinkler.similarity(str1, str2)
         return max(0, min(1, score))
 
+    @staticmethod
+    def levenshtein_similarity_batch(values, pairs, workers=1, score_cutoff=None):
+        return Comparison._score_pairs(Levenshtein.normalized_similarity, values, pairs, workers, score_cutoff)
+
+    @staticmethod
+    def jaro_winkler_similarity_batch(values, pairs, workers=1, score_cutoff=None):
+        return Comparison._score_pairs(JaroWinkler.similarity, values, pairs, workers, score_cutoff)
+
+    @staticmethod
+    def _string_values(values):
+        valid = np.array([not pd.isna(value) and bool(value) for value in values], dtype=bool)
+        strings = np.array([str(value) if is_valid else '' for value, is_valid in zip(values, valid)], dtype=object)
+        return strings, valid
+
+    @staticmethod
+    def _score_pairs(scorer, values, pairs, workers, score_cutoff=None):
+        strings, valid = Comparison._string_values(values)
+        scored = valid[pairs.row1] & valid[pairs.row2]
+        scores = np.zeros(len(pairs), dtype=np.float64)
+        if scored.any():
+            scores[scored] = cpdist(
+                strings[pairs.row1[scored]], strings[pairs.row2[scored]],
+                scorer=scorer, workers=workers, dtype=np.float64, score_cutoff=score_cutoff
+            )
+        return np.clip(scores, 0, 1)
+
     @staticmethod
     def qgram_similarity(str1, str2, q=10):
         if not str1 or not str2 or pd.isna(str1) or pd.isna(str2):
@@ -44,13 +91,74 @@ class Comparison:
         str1 = str(str1)
         str2 = str(str2)
         qgrams1 = generate_qgrams(str1, q)
-        qgrams2 = generate_qgrams(str2, q)
+        qgrams2 = set(generate_qgrams(str2, q))
         matches = sum(1 for q in qgrams1 if q in qgrams2)
-        total_qgrams = len(set(qgrams1 + qgrams2))
+        total_qgrams = len(qgrams2.union(qgrams1))
         score = matches / total_qgrams if total_qgrams > 0 else 0
         return max(0, min(1, score))
 
-    def compare_within_blocks(self, column_algorithms):
+    @staticmethod
+    def qgram_profiles(values, q=10):
+        strings, valid = Comparison._string_values(values)
+        records, grams = [], []
+        for record in np.flatnonzero(valid):
+            value = strings[record]
+            for i in range(len(value) - q + 1):
+                records.append(record)
+                grams.append(value[i:i + q])
+
+        gram_ids, uniques = pd.factorize(pd.Series(grams, dtype=object))
+        num_qgrams = max(len(uniques), 1)
+        keys = np.asarray(records, dtype=np.int64) * num_qgrams + gram_ids
+        keys, counts = np.unique(keys, return_counts=True)
+
+        # Profiles are stored CSR-style: the sorted distinct q-gram ids of
+        # record r are ids[offsets[r]:offsets[r + 1]], with their counts.
+        offsets = np.searchsorted(keys // num_qgrams, np.arange(len(values) + 1))
+        return {
+            'ids': keys % num_qgrams,
+            'counts': counts,
+            'offsets': offsets,
+            'num_qgrams': num_qgrams,
+            'qgrams': np.asarray(uniques, dtype=object),
+        }
+
+    @staticmethod
+    def qgram_similarity_batch(values, pairs, q=10, chunk_size=100000, score_cutoff=None):
+        profiles = Comparison.qgram_profiles(values, q)
+        scores = np.zeros(len(pairs), dtype=np.float64)
+        for start in range(0, len(pairs), chunk_size):
+            end = min(start + chunk_size, len(pairs))
+            scores[start:end] = Comparison._qgram_chunk_scores(
+                profiles, pairs.row1[start:end], pairs.row2[start:end]
+            )
+        scores = np.clip(scores, 0, 1)
+        if score_cutoff is not None:
+            scores[scores < score_cutoff] = 0
+        return scores
+
+    @staticmethod
+    def _expand_profiles(profiles, rows):
+        starts = profiles['offsets'][rows]
+        sizes = profiles['offsets'][rows + 1] - starts
+        pair_index = np.repeat(np.arange(len(rows), dtype=np.int64), sizes)
+        entries = np.arange(sizes.sum()) - np.repeat(np.cumsum(sizes) - sizes, sizes) + np.repeat(starts, sizes)
+        keys = pair_index * profiles['num_qgrams'] + profiles['ids'][entries]
+        return keys, pair_index, entries, sizes
+
+    @staticmethod
+    def _qgram_chunk_scores(profiles, row1, row2):
+        keys1, pair_index1, entries1, sizes1 = Comparison._expand_profiles(profiles, row1)
+        keys2, _, _, sizes2 = Comparison._expand_profiles(profiles, row2)
+
+        shared = np.isin(keys1, keys2)
+        matches = np.bincount(pair_index1, weights=profiles['counts'][entries1] * shared, minlength=len(row1))
+        intersection = np.bincount(pair_index1, weights=shared, minlength=len(row1))
+        total_qgrams = sizes1 + sizes2 - intersection
+        return np.divide(matches, total_qgrams, out=np.zeros(len(row1)), where=total_qgrams > 0)
+
+    def compare_within_blocks(self, column_algorithms, processes=None, chunk_size=200000, prune_threshold=None,
+                              candidate_pairs=None):
         block_col = "block_id"
         if block_col not in self.data.columns:
             raise ValueError(f"Block column '{block_col}' not found in data.")
@@ -61,34 +169,106 @@ class Comparison:
 
         self.methods = list(column_algorithms.keys())
         self.parameters = {col: func.__name__ for col, func in column_algorithms.items()}
+        if self.cache is not None:
+            self.cache_start = self.cache.counters()
+
+        pairs = candidate_pairs
+        if pairs is None and "candidates" in self.data.columns:
+            pairs = CandidatePairs.from_candidates(self.data["ID"], self.data["candidates"])
+        elif pairs is None:
+            pairs = CandidatePairs.from_block_ids(self.data[block_col].to_numpy())
 
-        results = []
+        results = pd.DataFrame({
+            "block_id": self.data[block_col].to_numpy()[pairs.row1],
+            "row1": self.data["ID"].to_numpy()[pairs.row1],
+            "row2": self.data["ID"].to_numpy()[pairs.row2],
+        })
 
-        grouped = self.data.groupby(block_col)
+        # Pruning is bounded on the plain mean of the scores, the aggregate
+        # threshold-based classification labels on.
+        num_columns = len(column_algorithms)
+        remaining_columns = num_columns
+        score_sum = np.zeros(len(pairs), dtype=np.float64)
+        # Positions of the pairs that can still reach the threshold.
+        alive = np.arange(len(pairs))
 
-        for block_id, group in grouped:
-            pairs = list(itertools.combinations(group.iterrows(), 2))
+        for position, (col, comparison_func) in enumerate(column_algorithms.items()):
+            values = self.data[col].to_numpy(dtype=object)
+            alive_pairs = CandidatePairs(pairs.row1[alive], pairs.row2[alive])
+            # Only columns that can still be skipped prune; the last one is
+            # scored in full for every pair that reaches it.
+            pruning = prune_threshold is not None and position < num_columns - 1
 
-            for (idx1, row1), (idx2, row2) in pairs:
-                result = {
-                    "block_id": block_id,
-                    "row1": row1["ID"],
-                    "row2": row2["ID"],
-                }
+            if pruning:
+                comparison_func = self._with_score_cutoff(comparison_func, num_columns, prune_threshold)
+            score_pairs = partial(self._score_column, comparison_func, processes=processes, chunk_size=chunk_size)
 
-                for col, comparison_func in column_algorithms.items():
-                    result[f"{col}_similarity"] = comparison_func(row1[col], row2[col])
+            scores = np.full(len(pairs), np.nan)
+            if self.cache is not None:
+                scores[alive] = self.cache.compare_column(comparison_func, values, alive_pairs, score_pairs)
+            else:
+                scores[alive] = score_pairs(values, alive_pairs)
+            results[f"{col}_similarity"] = scores
 
-                results.append(result)
+            if pruning:
+                # Upper bound: every column not scored yet could still be 1.0.
+                remaining_columns -= 1
+                score_sum[alive] += scores[alive]
+                upper_bound = (score_sum[alive] + remaining_columns) / num_columns
+                alive = alive[upper_bound >= prune_threshold - 1e-9]
 
-        self.comparison_results = pd.DataFrame(results)
+        if prune_threshold is not None:
+            pruned = np.ones(len(pairs), dtype=bool)
+            pruned[alive] = False
+            results["pruned"] = pruned
+            # Saved with the pairs so classification can check that its
+            # thresholds do not label pruned pairs wrongly.
+            results["prune_threshold"] = float(prune_threshold)
+
+        self.comparison_results = results
         return self.comparison_results.sort_values(by=block_col).reset_index(drop=True)
 
+    @staticmethod
+    def _with_score_cutoff(comparison_func, num_columns, prune_threshold):
+        if not getattr(comparison_func, 'batched', False):
+            return comparison_func
+
+        # Lowest score this column can have while the pair still reaches the
+        # threshold with every other column at 1.0. rapidfuzz compares against
+        # the cutoff with reduced precision, hence the margin.
+        score_cutoff = prune_threshold * num_columns - (num_columns - 1) - 1e-4
+        if score_cutoff <= 0:
+            return comparison_func
+        return BatchComparator(comparison_func.func, **comparison_func.options, score_cutoff=score_cutoff)
+
+    @staticmethod
+    def _score_column(comparison_func, values, pairs, processes=None, chunk_size=200000):
+        if processes and processes > 1 and len(pairs) > chunk_size:
+            return compare_in_processes({'values': values}, pairs, {'values': comparison_func},
+                                        processes, chunk_size)['values']
+        return Comparison._compare_column(comparison_func, values, pairs)
+
+    @staticmethod
+    def _compare_column(comparison_func, values, pairs):
+        if getattr(comparison_func, 'batched', False):
+            return comparison_func(values, pairs)
+
+        return np.fromiter(
+            (comparison_func(values[i], values[j]) for i, j in zip(pairs.row1.tolist(), pairs.row2.tolist())),
+            dtype=np.float64,
+            count=len(pairs)
+        )
+
     def get_comparison_results(self):
         if self.comparison_results is None:
             raise ValueError("No comparison results available. Run 'compare_within_blocks' first.")
         return self.comparison_results
 
+    def get_cache_statistics(self):
+        if self.cache is None:
+            raise ValueError("Similarity cache is disabled for this comparison.")
+        return self.cache.statistics(since=self.cache_start)
+
     def used_methods(self):
         return self.methods
 
@@ -4,17 +4,20 @@ import unicodedata
 import string
 import re
 import json
+from .CandidatePairs import SOURCE_ID_COLUMN
 
 
 class DataPreprocessing:
-    def __init__(self, data):
+    def __init__(self, data, source_column=None):
         self.data = data
+        self.source_column = source_column
         self.columns = None
         self.processed_data = data.copy()
 
     def select_columns(self, columns):
         if columns[0] == 'all':
-            self.columns = [col for col in self.data.columns if col != 'ID']
+            reserved = ('ID', self.source_column, SOURCE_ID_COLUMN) if self.source_column else ('ID',)
+            self.columns = [col for col in self.data.columns if col not in reserved]
         else:
             self.columns = columns
 
@@ -68,8 +71,13 @@ class DataPreprocessing:
             print(f"Error removing punctuation: {e}")
 
     def drop_duplicates(self):
+        # In linkage mode a record equal to one in the other source is a link,
+        # not a duplicate, so only duplicates within a source are dropped.
+        subset = self.columns
+        if self.source_column is not None:
+            subset = self.columns + [self.source_column]
         try:
-            self.processed_data = self.processed_data.drop_duplicates(subset=self.columns)
+            self.processed_data = self.processed_data.drop_duplicates(subset=subset)
         except Exception as e:
             print(f"Error dropping duplicates: {e}")
 
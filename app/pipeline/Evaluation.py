@@ -1,9 +1,11 @@
 import pandas as pd
+import numpy as np
 import json
+from .CandidatePairs import SOURCE_ID_COLUMN
 
 
 class Evaluation:
-    def __init__(self, source_data, classified_data):
+    def __init__(self, source_data, classified_data, source_column=None):
         self.json_data = None
         self.source_data = source_data
         self.classified_data = classified_data
@@ -11,36 +13,125 @@ class Evaluation:
         self.matches = None
         self.statistics = None
         self.used_parameters = None
+        self.source_column = source_column
+        self.linkage = source_column is not None
 
-    def show_matches_side_by_side(self):
+    def _links(self):
+        # Linkage mode: every match is a master/linked pair of records, looked up
+        # by the IDs given to them when both sources were combined.
         matches = self.classified_data[self.classified_data['classification'] == 'Match']
-        rows = []
-        dedup_id = 1
-
+        records = self.source_data.set_index('ID', drop=False)
+        links = []
         for _, row in matches.iterrows():
-            row1 = self.source_data.iloc[int(row['row1'])].copy()
-            row2 = self.source_data.iloc[int(row['row2'])].copy()
-
-            row1['dropped'] = 'NO'
-            row2['dropped'] = 'YES'
-            row1['dedup_id'] = dedup_id
-            row2['dedup_id'] = dedup_id
+            record1 = records.loc[row['row1']].copy()
+            record2 = records.loc[row['row2']].copy()
+            if record1[self.source_column] != 'master':
+                record1, record2 = record2, record1
+            links.append((record1, record2))
+        return links
 
-            dedup_id += 1
-            rows.append(row1)
-            rows.append(row2)
-
-        result_df = pd.DataFrame(rows)
+    def show_matches_side_by_side(self):
+        if self.linkage:
+            rows = []
+            for link_id, (master, linked) in enumerate(self._links(), start=1):
+                master['link_id'] = link_id
+                linked['link_id'] = link_id
+                rows.append(master)
+                rows.append(linked)
+
+            result_df = pd.DataFrame(rows, columns=['link_id']).reset_index(drop=True) if not rows \
+                else pd.DataFrame(rows).reset_index(drop=True)
+            columns = ['link_id'] + [col for col in result_df.columns if col != 'link_id']
+            self.matches = result_df[columns]
+            return self.matches
+
+        clusters = self._match_clusters()
+        representatives = np.flatnonzero(clusters == np.arange(len(clusters)))
+        sizes = np.bincount(clusters, minlength=len(clusters))
+
+        # One group per cluster of matched records, numbered in source order;
+        # the first record of a cluster is kept, the others are dropped.
+        dedup_ids = np.zeros(len(clusters), dtype=np.int64)
+        duplicated = representatives[sizes[representatives] > 1]
+        dedup_ids[duplicated] = np.arange(1, len(duplicated) + 1)
+        members = np.flatnonzero(sizes[clusters] > 1)
+        members = members[np.lexsort((members, dedup_ids[clusters[members]]))]
+
+        result_df = self.source_data.iloc[members].copy()
+        result_df['dropped'] = np.where(clusters[members] == members, 'NO', 'YES')
+        result_df['dedup_id'] = dedup_ids[clusters[members]]
         columns = ['dedup_id'] + [col for col in result_df.columns if col != 'dedup_id']
         self.matches = result_df[columns]
         return self.matches
 
     def get_deduplicated_data(self):
-        to_drop = [int(x) for x in self.classified_data[self.classified_data['classification'] == 'Match']['row2'].unique()]
-        self.evaluated_data = self.source_data.drop(index=to_drop).reset_index(drop=True)
+        if self.linkage:
+            data_columns = [col for col in self.source_data.columns
+                            if col not in ('ID', self.source_column, SOURCE_ID_COLUMN)]
+            rows = []
+            for link_id, (master, linked) in enumerate(self._links(), start=1):
+                row = {'link_id': link_id, 'master_ID': master[SOURCE_ID_COLUMN],
+                       'linked_ID': linked[SOURCE_ID_COLUMN]}
+                row.update({f"master_{col}": master[col] for col in data_columns})
+                row.update({f"linked_{col}": linked[col] for col in data_columns})
+                rows.append(row)
+
+            columns = ['link_id', 'master_ID', 'linked_ID'] + [
+                f"{source}_{col}" for col in data_columns for source in ('master', 'linked')]
+            self.evaluated_data = pd.DataFrame(rows, columns=columns)
+            return self.evaluated_data
+
+        clusters = self._match_clusters()
+        self.evaluated_data = self.source_data[clusters == np.arange(len(clusters))].reset_index(drop=True)
         return self.evaluated_data
 
+    def _match_clusters(self):
+        # Matches are merged transitively: every record is labelled with the
+        # position of the first record of its connected component.
+        matches = self.classified_data[self.classified_data['classification'] == 'Match']
+        positions = pd.Index(self.source_data['ID'])
+        row1 = positions.get_indexer(matches['row1'])
+        row2 = positions.get_indexer(matches['row2'])
+        if (row1 < 0).any() or (row2 < 0).any():
+            raise ValueError("Matches reference IDs that are not in the source data.")
+        return self._connected_components(len(self.source_data), row1, row2)
+
+    @staticmethod
+    def _connected_components(num_records, row1, row2):
+        # Vectorized union-find: roots are hooked onto the smaller root of
+        # each pair, then paths are compressed by pointer jumping.
+        labels = np.arange(num_records)
+        while True:
+            roots1, roots2 = labels[row1], labels[row2]
+            if (roots1 == roots2).all():
+                return labels
+            lower = np.minimum(roots1, roots2)
+            np.minimum.at(labels, roots1, lower)
+            np.minimum.at(labels, roots2, lower)
+            while True:
+                jumped = labels[labels]
+                if (jumped == labels).all():
+                    break
+                labels = jumped
+
     def get_statistics(self):
+        if self.linkage:
+            links = self.get_deduplicated_data()
+            sources = self.source_data[self.source_column]
+            num_linked = int((sources == 'linked').sum())
+            linked_matched = int(links['linked_ID'].nunique())
+
+            stats = {
+                'Detected links': int(len(links)),
+                'Master records': int((sources == 'master').sum()),
+                'Linked records': num_linked,
+                'Linked records matched': linked_matched,
+                'Match percentage': round(linked_matched / num_linked * 100, 2) if num_linked else 0.0,
+            }
+
+            self.statistics = pd.DataFrame([stats])
+            return self.statistics
+
         row_count_before = int(self.source_data.shape[0])
         deduplicated_data = self.get_deduplicated_data()
         row_count_after = int(deduplicated_data.shape[0])
@@ -0,0 +1,108 @@
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+from .CandidatePairs import CandidatePairs
+
+
+class SharedColumn:
+    # Layout of the shared buffer: int64 offsets (n + 1), uint8 valid flags (n),
+    # then the UTF-8 bytes of every valid value back to back.
+    def __init__(self, name, num_records):
+        self.name = name
+        self.num_records = num_records
+
+    @classmethod
+    def create(cls, strings, valid):
+        encoded = [value.encode('utf-8') if is_valid else b'' for value, is_valid in zip(strings, valid)]
+        num_records = len(encoded)
+        offsets = np.zeros(num_records + 1, dtype=np.int64)
+        np.cumsum([len(value) for value in encoded], out=offsets[1:])
+
+        header = 8 * (num_records + 1) + num_records
+        shm = shared_memory.SharedMemory(create=True, size=max(header + int(offsets[-1]), 1))
+        shm.buf[:8 * (num_records + 1)] = offsets.tobytes()
+        shm.buf[8 * (num_records + 1):header] = np.asarray(valid, dtype=np.uint8).tobytes()
+        shm.buf[header:header + int(offsets[-1])] = b''.join(encoded)
+        return cls(shm.name, num_records), shm
+
+    def read(self, records):
+        shm = shared_memory.SharedMemory(name=self.name)
+        try:
+            offsets = np.frombuffer(shm.buf, dtype=np.int64, count=self.num_records + 1)
+            valid = np.frombuffer(shm.buf, dtype=np.uint8, count=self.num_records, offset=offsets.nbytes)
+            data = shm.buf[offsets.nbytes + self.num_records:]
+            values = np.array([
+                bytes(data[offsets[record]:offsets[record + 1]]).decode('utf-8') if valid[record] else None
+                for record in records
+            ], dtype=object)
+            del offsets, valid, data
+            return values
+        finally:
+            shm.close()
+
+
+class SharedPairs:
+    def __init__(self, name, num_pairs):
+        self.name = name
+        self.num_pairs = num_pairs
+
+    @classmethod
+    def create(cls, pairs):
+        shm = shared_memory.SharedMemory(create=True, size=max(8 * len(pairs), 1))
+        shm.buf[:4 * len(pairs)] = pairs.row1.tobytes()
+        shm.buf[4 * len(pairs):8 * len(pairs)] = pairs.row2.tobytes()
+        return cls(shm.name, len(pairs)), shm
+
+    def read(self, start, end):
+        shm = shared_memory.SharedMemory(name=self.name)
+        try:
+            row1 = np.frombuffer(shm.buf, dtype=np.int32, count=end - start, offset=4 * start).copy()
+            row2 = np.frombuffer(shm.buf, dtype=np.int32, count=end - start,
+                                 offset=4 * (self.num_pairs + start)).copy()
+            return row1, row2
+        finally:
+            shm.close()
+
+
+def compare_chunk(shared_columns, shared_pairs, column_algorithms, start, end):
+    from .Comparison import Comparison
+
+    row1, row2 = shared_pairs.read(start, end)
+    records = np.unique(np.concatenate((row1, row2)))
+    pairs = CandidatePairs(np.searchsorted(records, row1), np.searchsorted(records, row2))
+
+    scores = {}
+    for col, comparison_func in column_algorithms.items():
+        values = shared_columns[col].read(records)
+        scores[col] = Comparison._compare_column(comparison_func, values, pairs)
+    return start, scores
+
+
+def compare_in_processes(columns, pairs, column_algorithms, processes, chunk_size):
+    from .Comparison import Comparison
+
+    segments = []
+    try:
+        shared_columns = {}
+        for col in column_algorithms:
+            shared_columns[col], shm = SharedColumn.create(*Comparison._string_values(columns[col]))
+            segments.append(shm)
+        shared_pairs, shm = SharedPairs.create(pairs)
+        segments.append(shm)
+
+        scores = {col: np.zeros(len(pairs), dtype=np.float64) for col in column_algorithms}
+        with ProcessPoolExecutor(max_workers=processes) as executor:
+            futures = [
+                executor.submit(compare_chunk, shared_columns, shared_pairs, column_algorithms,
+                                start, min(start + chunk_size, len(pairs)))
+                for start in range(0, len(pairs), chunk_size)
+            ]
+            for future in futures:
+                start, chunk_scores = future.result()
+                for col, values in chunk_scores.items():
+                    scores[col][start:start + len(values)] = values
+        return scores
+    finally:
+        for shm in segments:
+            shm.close()
+            shm.unlink()
@@ -0,0 +1,310 @@
+import pandas as pd
+import numpy as np
+from jellyfish import soundex
+from rapidfuzz.distance import Indel
+import json
+from .BlockBuilding import BlockBuilding
+from .CandidatePairs import CandidatePairs
+from .Classifier import Classifier
+from .Comparison import Comparison
+from .DataPreprocessing import DataPreprocessing
+
+LOOKUP_ID = '__lookup__'
+
+
+class CandidateIndex:
+    # Answers "which indexed records would blocking pair with this one?" for a
+    # single incoming record, without re-running blocking over the data.
+    def __init__(self, data, method, columns=None, window_size=5, max_window_size=10, match_threshold=0.8,
+                 n_letters=3, shingle_size=3, num_permutations=None, bands=20, rows=5, loose_threshold=0.5,
+                 tight_threshold=0.8, ngram_size=None, k=5, min_suffix_length=4, max_suffix_block_size=10,
+                 passes=None, **_):
+        if columns is None and method != 'multiPass':
+            raise ValueError("You must specify the columns for generating keys.")
+
+        self.method = method
+        self.columns = columns
+        self.options = {
+            'window_size': window_size,
+            'max_window_size': max_window_size,
+            'match_threshold': match_threshold,
+            'n_letters': n_letters,
+            'shingle_size': shingle_size,
+            'num_permutations': num_permutations if num_permutations is not None else bands * rows,
+            'bands': bands,
+            'rows': rows,
+            'loose_threshold': loose_threshold,
+            'tight_threshold': tight_threshold,
+            'ngram_size': ngram_size if method == 'canopyClustering' else shingle_size,
+            'k': k,
+            'min_suffix_length': min_suffix_length,
+            'max_suffix_block_size': max_suffix_block_size,
+        }
+        keys = self._builder(data)
+
+        if method == 'standardBlocking':
+            codes, uniques = pd.factorize(self._standard_keys(keys))
+            order = np.argsort(codes, kind='stable')
+            self.buckets = dict(zip(uniques, np.split(order, np.cumsum(np.bincount(codes))[:-1])))
+        elif method in ('sortedNeighborhood', 'slidingSortedNeighborhood', 'dynamicSortedNeighborhood'):
+            sorting_keys = keys._sorting_keys(columns, n_letters).to_numpy(dtype=object)
+            self.order = np.argsort(sorting_keys, kind='stable')
+            self.sorted_keys = sorting_keys[self.order]
+        elif method == 'minhashLSH':
+            profiles = Comparison.qgram_profiles(keys._joined_text(columns).to_numpy(dtype=object), q=shingle_size)
+            self.shingles = {shingle: i for i, shingle in enumerate(profiles['qgrams'])}
+            signatures = BlockBuilding._minhash_signatures(profiles['ids'], profiles['offsets'],
+                                                           self.options['num_permutations'], seed=0)
+            records = np.flatnonzero(np.diff(profiles['offsets']) > 0)
+            self.band_buckets = []
+            for band in range(bands):
+                band_keys = self._band_keys(signatures[records, band * rows:(band + 1) * rows])
+                codes, uniques = pd.factorize(band_keys)
+                order = np.argsort(codes, kind='stable')
+                self.band_buckets.append(
+                    dict(zip(uniques, np.split(records[order], np.cumsum(np.bincount(codes))[:-1]))))
+        elif method in ('canopyClustering', 'knnBlocking'):
+            ids, weights, offsets, tokens, self.idf = BlockBuilding._tfidf_rows(keys._joined_text(columns),
+                                                                                self.options['ngram_size'])
+            self.tokens = {token: i for i, token in enumerate(tokens)}
+            self.num_records = len(data)
+            rows = np.repeat(np.arange(len(data)), np.diff(offsets))
+            order = np.argsort(ids, kind='stable')
+            self.posting_rows, self.posting_weights = rows[order], weights[order]
+            self.posting_offsets = np.searchsorted(ids[order], np.arange(len(tokens) + 1))
+        elif method == 'setSimilarityJoin':
+            profiles = Comparison.qgram_profiles(keys._joined_text(columns).to_numpy(dtype=object), q=shingle_size)
+            self.shingles = {shingle: i for i, shingle in enumerate(profiles['qgrams'])}
+            self.set_sizes = np.diff(profiles['offsets'])
+            rows = np.repeat(np.arange(len(data)), self.set_sizes)
+            order = np.argsort(profiles['ids'], kind='stable')
+            self.posting_rows = rows[order]
+            self.posting_offsets = np.searchsorted(profiles['ids'][order], np.arange(len(self.shingles) + 1))
+        elif method == 'suffixArrayBlocking':
+            self.suffix_buckets = {}
+            for row, key in enumerate(keys._joined_text(columns)):
+                for start in range(len(key) - min_suffix_length + 1):
+                    self.suffix_buckets.setdefault(key[start:], []).append(row)
+        elif method == 'multiPass':
+            if not passes:
+                raise ValueError("At least one blocking pass must be provided for the multi-pass method.")
+            self.passes = [CandidateIndex(data, **blocking_pass) for blocking_pass in passes]
+        else:
+            raise ValueError(
+                "Invalid method. Use 'standardBlocking', 'sortedNeighborhood', 'slidingSortedNeighborhood', "
+                "'dynamicSortedNeighborhood', 'minhashLSH', 'canopyClustering', 'setSimilarityJoin', "
+                "'knnBlocking', 'suffixArrayBlocking' or 'multiPass'.")
+
+    def candidates(self, query):
+        if self.method == 'multiPass':
+            return np.unique(np.concatenate([blocking_pass.candidates(query) for blocking_pass in self.passes]))
+
+        keys = self._builder(query)
+        if self.method == 'standardBlocking':
+            return self.buckets.get(self._standard_keys(keys).iloc[0], np.empty(0, dtype=np.int64))
+
+        if self.method in ('sortedNeighborhood', 'slidingSortedNeighborhood', 'dynamicSortedNeighborhood'):
+            return self._sorted_neighbors(keys._sorting_keys(self.columns, self.options['n_letters']).iloc[0])
+
+        text = keys._joined_text(self.columns).iloc[0]
+        if self.method == 'minhashLSH':
+            return self._minhash_neighbors(text)
+        if self.method == 'setSimilarityJoin':
+            return self._jaccard_neighbors(text)
+        if self.method == 'suffixArrayBlocking':
+            return self._suffix_neighbors(text)
+
+        similarity = self._tfidf_similarity(text)
+        if self.method == 'knnBlocking':
+            return np.sort(np.argsort(-similarity, kind='stable')[:self.options['k']])
+        return np.flatnonzero(similarity >= self.options['loose_threshold'] - 1e-9)
+
+    def _builder(self, data):
+        builder = BlockBuilding(data, self.method)
+        builder.blocks = data
+        return builder
+
+    def _standard_keys(self, builder):
+        keys = [builder._column_keys(builder.blocks[col], soundex) for col in self.columns]
+        return keys[0].str.cat(keys[1:], sep=' ') if len(keys) > 1 else keys[0]
+
+    def _sorted_neighbors(self, key):
+        # The record is placed at its SKV position and paired with the records
+        # that a window around that position would reach.
+        position = np.searchsorted(self.sorted_keys, key)
+        if self.method == 'dynamicSortedNeighborhood':
+            width = max(self.options['max_window_size'], 1) - 1
+        else:
+            width = max(self.options['window_size'], 1) - 1
+        neighbors = np.arange(max(position - width, 0), min(position + width, len(self.sorted_keys)))
+
+        if self.method == 'dynamicSortedNeighborhood' and len(neighbors):
+            ratios = np.round(100 * np.array([
+                Indel.normalized_similarity(key, neighbor) if key and neighbor else float(key == neighbor)
+                for neighbor in self.sorted_keys[neighbors]
+            ]))
+            neighbors = neighbors[ratios >= self.options['match_threshold'] * 100]
+        return np.sort(self.order[neighbors])
+
+    def _minhash_neighbors(self, text):
+        shingle_size = self.options['shingle_size']
+        shingles = {text[i:i + shingle_size] for i in range(len(text) - shingle_size + 1)}
+        if not shingles:
+            return np.empty(0, dtype=np.int64)
+
+        # Shingles never seen in the index get fresh ids so they can still
+        # lower the query's minima without colliding with known shingles.
+        unknown = iter(range(len(self.shingles), len(self.shingles) + len(shingles)))
+        ids = np.sort([self.shingles.get(shingle, next(unknown)) for shingle in shingles])
+        signature = BlockBuilding._minhash_signatures(np.asarray(ids), np.array([0, len(ids)]),
+                                                      self.options['num_permutations'], seed=0)
+
+        rows = self.options['rows']
+        neighbors = [
+            buckets.get(self._band_keys(signature[:, band * rows:(band + 1) * rows])[0])
+            for band, buckets in enumerate(self.band_buckets)
+        ]
+        neighbors = [bucket for bucket in neighbors if bucket is not None]
+        return np.unique(np.concatenate(neighbors)) if neighbors else np.empty(0, dtype=np.int64)
+
+    def _suffix_neighbors(self, text):
+        # A shared suffix block still counts only while the query would not
+        # push it over the maximum block size.
+        neighbors = [
+            self.suffix_buckets.get(text[start:], [])
+            for start in range(len(text) - self.options['min_suffix_length'] + 1)
+        ]
+        neighbors = [bucket for bucket in neighbors if len(bucket) < self.options['max_suffix_block_size']]
+        return np.unique(np.concatenate(neighbors)).astype(np.int64) if neighbors else np.empty(0, dtype=np.int64)
+
+    def _jaccard_neighbors(self, text):
+        # Overlaps are counted over the postings of the query's known q-grams;
+        # unknown ones only enlarge the union.
+        shingle_size = self.options['shingle_size']
+        shingles = {text[i:i + shingle_size] for i in range(len(text) - shingle_size + 1)}
+        ids = np.array([self.shingles[shingle] for shingle in shingles if shingle in self.shingles], dtype=np.int64)
+        if not len(ids):
+            return np.empty(0, dtype=np.int64)
+
+        starts, lengths = self.posting_offsets[ids], np.diff(self.posting_offsets)[ids]
+        postings = np.repeat(starts - np.cumsum(lengths) + lengths, lengths) + np.arange(lengths.sum())
+        neighbors, overlaps = np.unique(self.posting_rows[postings], return_counts=True)
+        similarity = overlaps / (len(shingles) + self.set_sizes[neighbors] - overlaps)
+        return neighbors[similarity >= self.options['match_threshold'] - 1e-9]
+
+    def _tfidf_similarity(self, text):
+        ngram_size = self.options['ngram_size']
+        if ngram_size:
+            tokens = [text[i:i + ngram_size] for i in range(len(text) - ngram_size + 1)]
+        else:
+            tokens = text.split()
+        tokens, counts = np.unique(np.asarray(tokens, dtype=object), return_counts=True)
+
+        ids = np.array([self.tokens.get(token, -1) for token in tokens], dtype=np.int64)
+        known = ids >= 0
+        unseen_idf = np.log(1 + self.num_records) + 1
+        weights = counts * np.where(known, self.idf[ids.clip(min=0)] if len(self.idf) else 0, unseen_idf)
+        norm = np.sqrt((weights ** 2).sum())
+        ids, weights = ids[known], weights[known] / max(norm, 1e-12)
+
+        # Cosine similarity of the query with every indexed record.
+        starts, lengths = self.posting_offsets[ids], np.diff(self.posting_offsets)[ids]
+        postings = np.repeat(starts - np.cumsum(lengths) + lengths, lengths) + np.arange(lengths.sum())
+        similarity = np.bincount(self.posting_rows[postings],
+                                 weights=self.posting_weights[postings] * np.repeat(weights, lengths),
+                                 minlength=self.num_records)
+        return similarity.astype(np.float64)
+
+    @staticmethod
+    def _band_keys(band_rows):
+        # An object array keeps the bytes intact; a bytes array would strip
+        # trailing NUL bytes and merge distinct keys.
+        band_rows = np.ascontiguousarray(band_rows)
+        keys = np.empty(len(band_rows), dtype=object)
+        keys[:] = [row.tobytes() for row in band_rows]
+        return keys
+
+
+class RecordLookup:
+    def __init__(self, data, blocking, column_algorithms, preprocessing=None, classification=None):
+        if 'ID' not in data.columns:
+            raise ValueError("Indexed records must have an 'ID' column.")
+        missing_columns = [col for col in column_algorithms if col not in data.columns]
+        if missing_columns:
+            raise ValueError(f"Columns not found in the data: {', '.join(missing_columns)}.")
+
+        self.data = data.reset_index(drop=True)
+        self.blocking = dict(blocking)
+        self.column_algorithms = column_algorithms
+        self.preprocessing = preprocessing
+        self.classification = self._classification_with_state(classification)
+        self.index = CandidateIndex(self.data, **self.blocking)
+        self.values = {col: self.data[col].to_numpy(dtype=object) for col in column_algorithms}
+
+    @staticmethod
+    def _classification_with_state(classification):
+        # A query is compared with a handful of candidates, too few to fit the
+        # population-wide methods on; those reuse the batch run's state.
+        # An empty state means the batch run fitted nothing to reuse.
+        if not classification or classification.get('state'):
+            return classification
+        classification = dict(classification)
+        if classification.get('method') == 'weighted':
+            # Without a batch run the raw weighted score is normalized over
+            # the range the weights allow.
+            weights = classification.get('weights') or {}
+            classification['state'] = {
+                'min_similarity': sum(min(weight, 0) for weight in weights.values()),
+                'max_similarity': sum(max(weight, 0) for weight in weights.values()),
+            }
+        elif classification.get('method') == 'fellegi_sunter':
+            raise ValueError("Fellegi-Sunter lookups need the estimates of a saved classification step.")
+        return classification
+
+    def lookup(self, record, top_n=10):
+        query = pd.DataFrame([record]).reindex(columns=self.data.columns)
+        query['ID'] = LOOKUP_ID
+        if self.preprocessing:
+            preprocessor = DataPreprocessing(query)
+            preprocessor.select_columns(['all'])
+            query = preprocessor.apply_preprocessing(**self.preprocessing)
+
+        candidates = np.asarray(self.index.candidates(query), dtype=np.int64)
+        if not len(candidates):
+            return []
+
+        pairs = CandidatePairs(np.zeros(len(candidates)), np.arange(1, len(candidates) + 1))
+        comparison_table = pd.DataFrame({
+            'block_id': 1,
+            'row1': LOOKUP_ID,
+            'row2': self.data['ID'].to_numpy()[candidates],
+        })
+        for col, comparison_func in self.column_algorithms.items():
+            values = np.concatenate(([query[col].iloc[0]], self.values[col][candidates]))
+            comparison_table[f"{col}_similarity"] = Comparison._compare_column(comparison_func, values, pairs)
+
+        similarity_columns = [f"{col}_similarity" for col in self.column_algorithms]
+        results = comparison_table
+        if self.classification:
+            classifier = Classifier(blocked_data=pd.concat([query, self.data.iloc[candidates]]),
+                                    comparison_table=comparison_table)
+            results = classifier.classify_matches(**self.classification)
+        results = results.assign(score=comparison_table[similarity_columns].mean(axis=1))
+
+        results = results.sort_values(by='score', ascending=False, kind='stable').head(top_n)
+        output_columns = ['row2', 'score', *similarity_columns] + (['classification'] if self.classification else [])
+        scores = json.loads(results[output_columns].to_json(orient='records'))
+        records = json.loads(self.data.iloc[candidates[results.index]].to_json(orient='records', date_format='iso'))
+
+        matches = []
+        for score, matched_record in zip(scores, records):
+            match = {
+                'ID': score['row2'],
+                'score': score['score'],
+                'similarities': {col: score[col] for col in similarity_columns},
+                'record': matched_record,
+            }
+            if self.classification:
+                match['classification'] = score['classification']
+            matches.append(match)
+        return matches
@@ -0,0 +1,109 @@
+import pandas as pd
+import numpy as np
+from collections import OrderedDict
+from .CandidatePairs import CandidatePairs
+
+
+class SimilarityCache:
+    _shared = None
+
+    @classmethod
+    def shared(cls, max_size=100000):
+        # One cache for the process lifetime, so runs over the same data
+        # (re-runs, changed thresholds or columns) reuse each other's scores.
+        if cls._shared is None:
+            cls._shared = cls(max_size)
+        cls._shared.resize(max_size)
+        return cls._shared
+
+    def __init__(self, max_size=100000):
+        self.max_size = max_size
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.identical = 0
+
+    def get(self, key):
+        score = self.entries.get(key)
+        if score is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+            self.entries.move_to_end(key)
+        return score
+
+    def put(self, key, score):
+        self.entries[key] = score
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_size:
+            self.entries.popitem(last=False)
+
+    def resize(self, max_size):
+        self.max_size = max_size
+        while len(self.entries) > self.max_size:
+            self.entries.popitem(last=False)
+
+    def compare_column(self, comparison_func, values, pairs, score_pairs):
+        options = getattr(comparison_func, 'options', {})
+        algorithm = (getattr(comparison_func, 'func', comparison_func), options.get('score_cutoff'))
+        q = options.get('q')
+
+        codes, uniques = pd.factorize(pd.Series(values, dtype=object), use_na_sentinel=False)
+        uniques = np.asarray(uniques, dtype=object)
+        num_values = max(len(uniques), 1)
+        value_pairs = codes[pairs.row1].astype(np.int64) * num_values + codes[pairs.row2]
+        value_pairs, inverse = np.unique(value_pairs, return_inverse=True)
+        first, second = np.divmod(value_pairs, num_values)
+
+        unique_scores = np.zeros(len(value_pairs), dtype=np.float64)
+        identical = (first == second) & self._identical_scores_one(uniques, q)[first]
+        unique_scores[identical] = 1.0
+        self.identical += int(identical.sum())
+
+        missing = np.flatnonzero(~identical)
+        # Looking up more distinct value pairs than the cache can hold would
+        # only churn it, so those are scored once each without memoization.
+        if len(missing) <= self.max_size:
+            key_values = [None if pd.isna(value) else value for value in uniques]
+            keys = [(algorithm, q, key_values[i], key_values[j]) for i, j in zip(first[missing], second[missing])]
+            cached = [self.get(key) for key in keys]
+            found = np.array([score is not None for score in cached], dtype=bool)
+            unique_scores[missing[found]] = [score for score in cached if score is not None]
+            keys = [key for key, is_found in zip(keys, found) if not is_found]
+            missing = missing[~found]
+        else:
+            keys = None
+            self.misses += len(missing)
+
+        if len(missing):
+            unique_scores[missing] = score_pairs(uniques, CandidatePairs(first[missing], second[missing]))
+            if keys is not None:
+                for key, score in zip(keys, unique_scores[missing].tolist()):
+                    self.put(key, score)
+
+        return unique_scores[inverse.ravel()]
+
+    @staticmethod
+    def _identical_scores_one(uniques, q):
+        return np.array([
+            not pd.isna(value) and bool(value) and (q is None or len(str(value)) >= q)
+            for value in uniques
+        ], dtype=bool)
+
+    def counters(self):
+        return {'hits': self.hits, 'misses': self.misses, 'identical': self.identical}
+
+    def statistics(self, since=None):
+        # Counts since an earlier counters() snapshot, e.g. for one run of a
+        # cache that is shared between runs.
+        since = since or {'hits': 0, 'misses': 0, 'identical': 0}
+        hits, misses = self.hits - since['hits'], self.misses - since['misses']
+        lookups = hits + misses
+        return {
+            'hits': hits,
+            'misses': misses,
+            'identical': self.identical - since['identical'],
+            'size': len(self.entries),
+            'max_size': self.max_size,
+            'hit_rate': round(hits / lookups, 4) if lookups else 0.0,
+        }
@@ -1,6 +1,8 @@
 import pytest
+import itertools
 import pandas as pd
 from ..BlockBuilding import BlockBuilding
+from ..Comparison import Comparison
 
 @pytest.fixture
 def dummy_data_frame():
@@ -39,3 +41,222 @@ def test_blockBuildingStandardBlockingDifferentRows(dummy_data_frame):
     blockBuilding = BlockBuilding(dummy_data_frame, 'standardBlocking')
     blockBuilding.build_blocks(['col2'])
     assert blockBuilding.get_num_blocks() == 2
+
+def test_blockBuildingStandardBlockingKeys():
+    data = pd.DataFrame({'col1': ['Robert', 'Rupert', None, 'Robert'], 'col2': ['Smith', 'Smyth', 'Smith', 5]})
+    blockBuilding = BlockBuilding(data, 'standardBlocking')
+    blockBuilding.build_blocks(['col1', 'col2'])
+    blocks = blockBuilding.get_blocks()
+    assert blocks['BKV'].tolist() == ['R163 S530', 'R163 S530', ' S530', 'R163 ']
+    assert blocks['block_id'].tolist() == [3, 3, 1, 2]
+
+def test_blockBuildingDynamicSortedNeighborhoodWindows():
+    data = pd.DataFrame({'col1': ['anna', 'annie', 'anne', 'bob', 'bobby', None, 'carl', 'carla', 'carlos']})
+    blockBuilding = BlockBuilding(data, 'dynamicSortedNeighborhood')
+    blockBuilding.build_blocks(['col1'], max_window_size=2, match_threshold=0.6, n_letters=3)
+    blocks = blockBuilding.get_blocks()
+    assert blocks['SKV'].tolist() == ['', 'anna', 'anne', 'anni', 'bob', 'bobb', 'carl', 'carl', 'carl']
+    assert blocks['block_id'].tolist() == [1, 2, 2, 3, 4, 4, 5, 5, 6]
+    assert blockBuilding.get_num_blocks() == 6
+
+def test_blockBuildingSlidingSortedNeighborhoodPairs():
+    data = pd.DataFrame({'ID': [0, 1, 2, 3], 'col1': ['dave', 'anna', 'carl', 'bob']})
+    blockBuilding = BlockBuilding(data, 'slidingSortedNeighborhood')
+    blockBuilding.build_blocks(['col1'], window_size=3)
+    pairs = blockBuilding.get_candidate_pairs()
+    ids = blockBuilding.get_blocks()['ID'].tolist()
+    assert ids == [1, 3, 2, 0]
+    assert [(ids[i], ids[j]) for i, j in zip(pairs.row1, pairs.row2)] == [(1, 3), (1, 2), (3, 2), (3, 0), (2, 0)]
+    assert [row['candidates'] for row in blockBuilding.dataframe_to_jsonb()] == [[3, 2], [2, 0], [0], []]
+
+def test_blockBuildingMultiPassUnion():
+    data = pd.DataFrame({
+        'ID': [0, 1, 2, 3],
+        'last': ['smith', 'smyth', 'jones', 'jonas'],
+        'zip': ['10001', '20002', '10001', '30003'],
+    })
+    blockBuilding = BlockBuilding(data, 'multiPass')
+    blockBuilding.build_blocks(passes=[
+        {'method': 'standardBlocking', 'columns': ['last']},
+        {'method': 'standardBlocking', 'columns': ['zip']},
+        {'method': 'standardBlocking', 'columns': ['last', 'zip']},
+    ])
+    pairs = blockBuilding.get_candidate_pairs()
+    assert list(zip(pairs.row1, pairs.row2)) == [(0, 1), (0, 2), (2, 3)]
+    statistics = blockBuilding.used_parameters()['passes']
+    assert [(s['num_pairs'], s['new_pairs']) for s in statistics] == [(2, 2), (1, 1), (0, 0)]
+
+def test_blockBuildingMultiPassNoPasses(dummy_data_frame):
+    with pytest.raises(ValueError):
+        BlockBuilding(dummy_data_frame, 'multiPass').build_blocks()
+
+def test_blockBuildingMinhashLSHPairs():
+    data = pd.DataFrame({
+        'ID': [0, 1, 2, 3, 4],
+        'name': ['john smith', 'john smith', 'mary jones', 'zzzz qqqq', 'ab'],
+    })
+    blockBuilding = BlockBuilding(data, 'minhashLSH')
+    blockBuilding.build_blocks(['name'], shingle_size=3, bands=8, rows=2)
+    pairs = blockBuilding.get_candidate_pairs()
+    assert list(zip(pairs.row1, pairs.row2)) == [(0, 1)]
+    assert blockBuilding.used_parameters()['num_permutations'] == 16
+    assert blockBuilding.get_num_blocks() == 5
+
+def test_blockBuildingMinhashLSHTooManyBands(dummy_data_frame):
+    with pytest.raises(ValueError):
+        BlockBuilding(dummy_data_frame, 'minhashLSH').build_blocks(['col1'], num_permutations=10, bands=4, rows=3)
+
+def test_blockBuildingCanopyClusteringOverlap():
+    data = pd.DataFrame({
+        'ID': [0, 1, 2, 3],
+        'name': ['acme corp', 'acme corp', 'acme foods', 'north bank'],
+    })
+    blockBuilding = BlockBuilding(data, 'canopyClustering')
+    blockBuilding.build_blocks(['name'], loose_threshold=0.3, tight_threshold=0.9)
+    assert blockBuilding.get_blocks()['block_id'].tolist() == [1, 1, 1, 3]
+    assert blockBuilding.get_num_blocks() == 3
+    pairs = blockBuilding.get_candidate_pairs()
+    assert list(zip(pairs.row1, pairs.row2)) == [(0, 1), (0, 2), (1, 2)]
+
+def test_blockBuildingCanopyClusteringThresholds(dummy_data_frame):
+    with pytest.raises(ValueError):
+        BlockBuilding(dummy_data_frame, 'canopyClustering').build_blocks(['col1'], loose_threshold=0.9,
+                                                                          tight_threshold=0.5)
+
+def test_blockBuildingSetSimilarityJoinMatchesAllPairs():
+    names = ['john smith', 'jon smith', 'john smyth', 'mary jones', 'marie jones', None, 'ab', 'smith john']
+    data = pd.DataFrame({'ID': range(len(names)), 'name': names})
+    blockBuilding = BlockBuilding(data, 'setSimilarityJoin')
+    blockBuilding.build_blocks(['name'], match_threshold=0.5, shingle_size=2)
+    pairs = blockBuilding.get_candidate_pairs()
+
+    qgrams = [{name[i:i + 2] for i in range(len(name) - 1)} if name else set() for name in names]
+    expected = [
+        (i, j) for i, j in itertools.combinations(range(len(names)), 2)
+        if qgrams[i] and qgrams[j] and len(qgrams[i] & qgrams[j]) / len(qgrams[i] | qgrams[j]) >= 0.5
+    ]
+    assert list(zip(pairs.row1, pairs.row2)) == expected
+    assert len(expected) == 4
+
+def test_blockBuildingSetSimilarityJoinNoThreshold(dummy_data_frame):
+    with pytest.raises(ValueError):
+        BlockBuilding(dummy_data_frame, 'setSimilarityJoin').build_blocks(['col1'])
+
+def test_blockBuildingKnnBlockingFixedBudget():
+    names = ['john smith', 'jon smith', 'john smyth', 'mary jones', 'marie jones', 'peter pan']
+    data = pd.DataFrame({'ID': range(len(names)), 'name': names})
+    blockBuilding = BlockBuilding(data, 'knnBlocking')
+    blockBuilding.build_blocks(['name'], k=1, chunk_size=10)
+    pairs = blockBuilding.get_candidate_pairs()
+    assert len(pairs) <= len(names)
+    assert {(0, 1), (0, 2), (3, 4)} <= set(zip(pairs.row1.tolist(), pairs.row2.tolist()))
+    assert all(((pairs.row1 == row) | (pairs.row2 == row)).any() for row in range(len(names)))
+
+def test_blockBuildingKnnBlockingSameForAnyChunkSize():
+    names = ['anna', 'ana', 'hannah', 'john', 'jon', 'joan', None]
+    data = pd.DataFrame({'ID': range(len(names)), 'name': names})
+    results = []
+    for chunk_size in (1, 20, 4000000):
+        blockBuilding = BlockBuilding(data, 'knnBlocking')
+        blockBuilding.build_blocks(['name'], k=2, shingle_size=2, chunk_size=chunk_size)
+        pairs = blockBuilding.get_candidate_pairs()
+        results.append(list(zip(pairs.row1.tolist(), pairs.row2.tolist())))
+    assert results[0] == results[1] == results[2]
+
+def test_blockBuildingKnnBlockingFillsWithLowestPositions():
+    data = pd.DataFrame({'ID': range(5), 'name': ['anna', 'anne', 'bob', 'rob', 'xyz']})
+    blockBuilding = BlockBuilding(data, 'knnBlocking')
+    blockBuilding.build_blocks(['name'], k=1, shingle_size=2, chunk_size=3)
+    pairs = blockBuilding.get_candidate_pairs()
+    assert list(zip(pairs.row1.tolist(), pairs.row2.tolist())) == [(0, 1), (0, 4), (2, 3)]
+
+def test_blockBuildingSuffixArrayTypoInFirstLetters():
+    data = pd.DataFrame({'ID': range(5), 'name': ['katherine', 'catherine', 'kathryn', 'marine', 'at']})
+    blockBuilding = BlockBuilding(data, 'suffixArrayBlocking')
+    blockBuilding.build_blocks(['name'], min_suffix_length=5, max_suffix_block_size=2)
+    pairs = blockBuilding.get_candidate_pairs()
+    assert list(zip(pairs.row1, pairs.row2)) == [(0, 1)]
+    assert blockBuilding.used_parameters()['dropped_suffix_blocks'] == 0
+
+def test_blockBuildingSuffixArrayMaxBlockSize():
+    data = pd.DataFrame({'ID': range(4), 'name': ['annaberg', 'hamberg', 'lemberg', 'hamberg']})
+    blockBuilding = BlockBuilding(data, 'suffixArrayBlocking')
+    blockBuilding.build_blocks(['name'], min_suffix_length=4, max_suffix_block_size=2)
+    pairs = blockBuilding.get_candidate_pairs()
+    assert list(zip(pairs.row1, pairs.row2)) == [(1, 3)]
+    assert blockBuilding.used_parameters()['dropped_suffix_blocks'] == 2
+
+def test_blockBuildingRefineEmptyAndOversizedBlocks():
+    data = pd.DataFrame({'ID': range(6), 'col1': ['ann', 'anne', 'ann', None, None, 'bob']})
+    blockBuilding = BlockBuilding(data, 'standardBlocking')
+    blockBuilding.build_blocks(['col1'])
+    blockBuilding.refine_blocks(max_block_size=2, oversized='split', drop_empty_keys=True)
+    assert blockBuilding.get_blocks()['block_id'].tolist() == [3, 3, 4, 1, 2, 5]
+    statistics = blockBuilding.used_parameters()['refinement']
+    assert (statistics['pairs_before'], statistics['pairs_after']) == (4, 1)
+    assert statistics['oversized_blocks'] == 1
+
+def test_blockBuildingRefineMetaBlockingTopK():
+    data = pd.DataFrame({
+        'ID': [0, 1, 2, 3],
+        'first': ['ann', 'ann', 'ann', 'bob'],
+        'last': ['lee', 'lee', 'ray', 'ray'],
+    })
+    blockBuilding = BlockBuilding(data, 'multiPass')
+    blockBuilding.build_blocks(passes=[
+        {'method': 'standardBlocking', 'columns': ['first']},
+        {'method': 'standardBlocking', 'columns': ['last']},
+    ])
+    blockBuilding.refine_blocks(meta_blocking='cbs', top_k=1)
+    pairs = blockBuilding.get_candidate_pairs()
+    assert list(zip(pairs.row1, pairs.row2)) == [(0, 1), (0, 2), (2, 3)]
+
+def test_blockBuildingRefineSizeLimitOnPairs():
+    data = pd.DataFrame({'ID': [0, 1, 2], 'col1': ['a', 'b', 'c']})
+    blockBuilding = BlockBuilding(data, 'slidingSortedNeighborhood')
+    blockBuilding.build_blocks(['col1'], window_size=2)
+    with pytest.raises(ValueError):
+        blockBuilding.refine_blocks(max_block_size=2)
+
+def test_blockBuildingEstimateCost():
+    data = pd.DataFrame({'ID': range(6), 'col1': ['ann', 'anne', 'ann', 'bob', 'rob', 'bobby']})
+    blockBuilding = BlockBuilding(data, 'standardBlocking')
+    blockBuilding.build_blocks(['col1'])
+    estimate = blockBuilding.estimate_cost({'col1': Comparison.jaro_winkler_similarity}, sample_size=10)
+    assert (estimate['num_pairs'], estimate['total_pairs'], estimate['reduction_ratio']) == (4, 15, 0.733333)
+    assert estimate['block_size_histogram'] == [{'size': 1, 'blocks': 1}, {'size': 2, 'blocks': 1},
+                                                {'size': 3, 'blocks': 1}]
+    assert estimate['largest_blocks'][0] == {'block_id': 1, 'size': 3, 'pairs': 3}
+    assert estimate['sampled_pairs'] == 4
+    assert estimate['estimated_seconds'] >= 0
+
+def test_blockBuildingEstimateCostPairBasedReportsPairsOnly():
+    data = pd.DataFrame({
+        'ID': [0, 1, 2, 3],
+        'name': ['acme corp', 'acme corp', 'acme foods', 'north bank'],
+    })
+    blockBuilding = BlockBuilding(data, 'canopyClustering')
+    blockBuilding.build_blocks(['name'], loose_threshold=0.3, tight_threshold=0.9)
+    estimate = blockBuilding.estimate_cost()
+    assert (estimate['num_pairs'], estimate['total_pairs'], estimate['reduction_ratio']) == (3, 6, 0.5)
+    assert not {'num_blocks', 'block_size_histogram', 'largest_blocks'} & estimate.keys()
+
+def test_blockBuildingLinkageOnlyCrossSourcePairs():
+    data = pd.DataFrame({
+        'ID': [1, 2, 3, 4, 5],
+        'name': ['smith', 'smith', 'smith', 'jones', 'jones'],
+        'source': ['master', 'master', 'linked', 'master', 'linked'],
+    })
+    builder = BlockBuilding(data, 'standardBlocking', source_column='source')
+    builder.build_blocks(['name'])
+    pairs = builder.get_candidate_pairs()
+    sources = builder.blocks['source'].to_numpy()
+    assert len(pairs) == 3
+    assert all(sources[pairs.row1] != sources[pairs.row2])
+    assert builder.estimate_cost()['num_pairs'] == 3
+    assert builder.estimate_cost()['total_pairs'] == 6
+    assert 'candidates' in builder.dataframe_to_jsonb()[0]
+
+def test_blockBuildingLinkageMissingSourceColumn(dummy_data_frame):
+    with pytest.raises(ValueError):
+        BlockBuilding(dummy_data_frame, 'standardBlocking', source_column='source').build_blocks(['col1'])
@@ -0,0 +1,38 @@
+import pytest
+import pandas as pd
+from ..BlockBuilding import BlockBuilding
+from ..BlockingIndex import BlockingIndex
+
+@pytest.fixture
+def people():
+    return pd.DataFrame({
+        'ID': [1, 2, 3, 4, 5, 6, 7],
+        'first': ['ann', 'anne', 'bob', None, 'ana', 'rob', None],
+        'last': ['lee', 'lee', 'ray', 'ray', 'lee', 'ray', 'ray'],
+    })
+
+def test_BlockingIndexNoColumns():
+    with pytest.raises(ValueError):
+        BlockingIndex([])
+
+def test_BlockingIndexBuild(people):
+    blockingIndex = BlockingIndex(['first'])
+    buckets = blockingIndex.build(people)
+    assert buckets == {'A500': [1, 2, 5], 'B100': [3], '': [4, 7], 'R100': [6]}
+
+def test_BlockingIndexAddRecordsMatchesFullRebuild(people):
+    blockingIndex = BlockingIndex(['first', 'last'])
+    blockingIndex.build(people.iloc[:4])
+    new_pairs = blockingIndex.add_records(people.iloc[4:])
+
+    blockBuilding = BlockBuilding(people, 'standardBlocking')
+    blockBuilding.build_blocks(['first', 'last'])
+    pairs = blockBuilding.get_candidate_pairs()
+    ids = blockBuilding.get_blocks()['ID'].to_numpy()
+    expected = {frozenset((ids[i], ids[j])) for i, j in zip(pairs.row1, pairs.row2)} - {frozenset((1, 2))}
+    assert {frozenset(pair) for pair in zip(new_pairs['ID1'], new_pairs['ID2'])} == expected
+    assert list(zip(new_pairs['ID1'], new_pairs['ID2'])) == [(1, 5), (2, 5), (4, 7)]
+
+def test_BlockingIndexAddRecordsWithoutID(people):
+    with pytest.raises(ValueError):
+        BlockingIndex(['first']).add_records(people.drop(columns=['ID']))
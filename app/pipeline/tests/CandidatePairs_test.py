@@ -0,0 +1,28 @@
+import pytest
+import numpy as np
+from ..CandidatePairs import CandidatePairs
+
+
+def test_CandidatePairsFromBlockIds():
+    pairs = CandidatePairs.from_block_ids([2, 1, 2, 1, 2, 3])
+    assert pairs.row1.dtype == np.int32
+    assert list(zip(pairs.row1, pairs.row2)) == [(1, 3), (0, 2), (0, 4), (2, 4)]
+
+def test_CandidatePairsFromBlockIdsNoPairs():
+    assert len(CandidatePairs.from_block_ids([1, 2, 3])) == 0
+    assert len(CandidatePairs.from_block_ids([])) == 0
+
+def test_CandidatePairsCandidatesRoundTrip():
+    pairs = CandidatePairs([0, 2, 0, 1], [1, 3, 3, 2])
+    candidates = pairs.to_candidates(['a', 'b', 'c', 'd'])
+    assert candidates == [['b', 'd'], ['c'], ['d'], []]
+    restored = CandidatePairs.from_candidates(['a', 'b', 'c', 'd'], candidates)
+    assert list(zip(restored.row1, restored.row2)) == [(0, 1), (0, 3), (1, 2), (2, 3)]
+
+def test_CandidatePairsUnknownCandidate():
+    with pytest.raises(ValueError):
+        CandidatePairs.from_candidates(['a', 'b'], [['z'], []])
+
+def test_CandidatePairsCrossSource():
+    pairs = CandidatePairs([0, 0, 1, 2], [1, 2, 3, 3]).cross_source(['master', 'master', 'linked', 'linked'])
+    assert list(zip(pairs.row1, pairs.row2)) == [(0, 2), (1, 3)]
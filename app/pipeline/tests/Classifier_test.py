@@ -20,4 +20,173 @@ def test_Classifier1():
     })
     classifier = Classifier(blocks, comparisons)
     result = classifier.classify_matches(thresholds = {'match': 0.5})
-    assert result[['classification']].equals(pd.DataFrame({'classification': ['Match', 'Match', 'Match', 'Match', 'Match', 'Match']}))
\ No newline at end of file
+    assert result[['classification']].astype(object).equals(pd.DataFrame({'classification': ['Match', 'Match', 'Match', 'Match', 'Match', 'Match']}))
+
+def test_ClassifierPrunedPairsAreNotMatches():
+    blocks = pd.DataFrame({
+        'ID': [0, 1, 2],
+        'block_id': [1, 1, 1],
+        'a': ['a', 'a', 'b'],
+    })
+    comparisons = pd.DataFrame({
+        'block_id': [1, 1, 1],
+        'row1': [0, 0, 1],
+        'row2': [1, 2, 2],
+        'a_similarity': [1.0, 0.9, float('nan')],
+        'pruned': [False, True, True],
+        'prune_threshold': [0.5, 0.5, 0.5],
+    })
+    classifier = Classifier(blocks, comparisons)
+    result = classifier.classify_matches(thresholds={'match': 0.5})
+    assert result['classification'].tolist() == ['Match', 'Not Match', 'Not Match']
+
+def test_ClassifierThresholdsBelowPruneThreshold():
+    blocks = pd.DataFrame({'ID': [0, 1, 2], 'a': ['a', 'a', 'b']})
+    comparisons = pd.DataFrame({
+        'block_id': [1, 1, 1],
+        'row1': [0, 0, 1],
+        'row2': [1, 2, 2],
+        'a_similarity': [1.0, 0.6, 0.2],
+        'b_similarity': [1.0, 0.7, float('nan')],
+        'pruned': [False, False, True],
+        'prune_threshold': [0.6, 0.6, 0.6],
+    })
+    classifier = Classifier(blocks, comparisons)
+    with pytest.raises(ValueError):
+        classifier.classify_matches(thresholds={'match': 0.5})
+    with pytest.raises(ValueError):
+        classifier.classify_matches(thresholds={'match': 0.8, 'not_match': 0.5}, possible_match=True)
+    result = classifier.classify_matches(thresholds={'match': 0.8, 'not_match': 0.6}, possible_match=True)
+    assert result['classification'].tolist() == ['Match', 'Possible Match', 'Not Match']
+    assert classifier.threshold_sweep()['threshold'].tolist() == pytest.approx([1.0, 0.65])
+
+def test_ClassifierRowDetailsJoinedOnDemand():
+    blocks = pd.DataFrame({
+        'ID': [10, 11, 12],
+        'block_id': [1, 1, 1],
+        'name': ['ann', 'anne', 'bob'],
+        'city': ['oslo', 'oslo', 'rome'],
+    })
+    comparisons = pd.DataFrame({
+        'block_id': [1, 1],
+        'row1': [10, 11],
+        'row2': [11, 12],
+        'name_similarity': [0.9, 0.1],
+    })
+    classifier = Classifier(blocks, comparisons)
+    result = classifier.classify_matches(thresholds={'match': 0.5})
+    assert not [col for col in result.columns if col.startswith('row1_')]
+
+    matches = classifier.row_details(result[result['classification'] == 'Match'], columns=['name'])
+    assert matches[['row1_name', 'row2_name']].values.tolist() == [['ann', 'anne']]
+    saved = classifier.dataframe_to_jsonb()
+    assert saved[1]['row2_name'] == 'bob' and 'row2_city' not in saved[1]
+    assert classifier.dataframe_to_jsonb(detail_columns=[])[1].keys().isdisjoint({'row2_name', 'row2_city'})
+    assert classifier.row_details(pd.DataFrame(saved))['row2_city'].tolist() == ['oslo', 'rome']
+
+def test_ClassifierRowDetailsUnknownColumn():
+    blocks = pd.DataFrame({'ID': [0, 1], 'name': ['a', 'b']})
+    comparisons = pd.DataFrame({'block_id': [1], 'row1': [0], 'row2': [1], 'name_similarity': [1.0]})
+    classifier = Classifier(blocks, comparisons)
+    classifier.classify_matches(thresholds={'match': 0.5})
+    with pytest.raises(ValueError):
+        classifier.row_details(columns=['age'])
+
+def test_ClassifierCategoricalLabels():
+    blocks = pd.DataFrame({'ID': [0, 1, 2, 3], 'a': ['a', 'b', 'c', 'd']})
+    comparisons = pd.DataFrame({
+        'block_id': [1, 1, 1, 1],
+        'row1': [0, 0, 1, 2],
+        'row2': [1, 2, 3, 3],
+        'a_similarity': [0.1, 0.4, 0.7, float('nan')],
+        'b_similarity': [0.1, 0.4, 0.9, 0.2],
+    })
+    classifier = Classifier(blocks, comparisons)
+    result = classifier.classify_matches(thresholds={'match': 0.6, 'not_match': 0.3}, possible_match=True)
+    assert result['classification'].dtype == 'category'
+    assert result['classification'].cat.codes.dtype == 'int8'
+    assert result['classification'].tolist() == ['Not Match', 'Possible Match', 'Match', 'Not Match']
+
+def test_ClassifierFellegiSunterEstimatesMatches():
+    matches = [(0.95, 0.9), (0.9, 1.0), (1.0, 0.85), (0.9, 0.95), (1.0, 1.0)]
+    non_matches = [(0.1, 0.2), (0.3, 0.1), (0.2, 0.4), (0.6, 0.1), (0.1, 0.6), (0.2, 0.2), (0.4, 0.3)] * 4
+    scores = matches + non_matches
+    blocks = pd.DataFrame({'ID': [0, 1], 'a': ['x', 'y']})
+    comparisons = pd.DataFrame({
+        'block_id': 1,
+        'row1': 0,
+        'row2': 1,
+        'a_similarity': [a for a, _ in scores],
+        'b_similarity': [b for _, b in scores],
+    })
+    classifier = Classifier(blocks, comparisons)
+    result = classifier.classify_matches(method='fellegi_sunter', levels=[0.5, 0.8])
+    assert result['classification'].tolist() == ['Match'] * len(matches) + ['Non-Match'] * len(non_matches)
+    assert (result['match_weight'][:len(matches)] > 0).all()
+    assert classifier.used_parameters()['num_patterns'] == 4
+
+def test_ClassifierFellegiSunterInvalidLevels():
+    comparisons = pd.DataFrame({'block_id': [1], 'row1': [0], 'row2': [1], 'a_similarity': [1.0]})
+    with pytest.raises(ValueError):
+        Classifier(pd.DataFrame({'ID': [0, 1]}), comparisons).classify_matches(method='fellegi_sunter', levels=[1.5])
+
+def test_ClassifierThresholdSweep():
+    blocks = pd.DataFrame({'ID': [0, 1, 2, 3]})
+    comparisons = pd.DataFrame({
+        'block_id': [1, 1, 1, 1, 1],
+        'row1': [0, 0, 1, 2, 1],
+        'row2': [1, 2, 2, 3, 3],
+        'a_similarity': [0.9, 0.5, 0.5, 0.2, 0.8],
+        'pruned': [False, False, False, False, True],
+        'prune_threshold': [0.2, 0.2, 0.2, 0.2, 0.2],
+    })
+    classifier = Classifier(blocks, comparisons)
+    sweep = classifier.threshold_sweep(true_matches=[[1, 0], [3, 2], [0, 3]])
+    assert sweep['threshold'].tolist() == [0.9, 0.5, 0.2]
+    assert sweep['matches'].tolist() == [1, 3, 4]
+    assert sweep['true_positives'].tolist() == [1, 1, 2]
+    assert sweep['recall'].tolist() == pytest.approx([1 / 3, 1 / 3, 2 / 3])
+    for threshold, matches in zip(sweep['threshold'], sweep['matches']):
+        result = classifier.classify_matches(thresholds={'match': threshold})
+        assert (result['classification'] == 'Match').sum() == matches
+
+def test_ClassifierThresholdSweepOnClassificationOutput():
+    blocks = pd.DataFrame({'ID': [0, 1, 2, 3], 'name': ['a', 'b', 'c', 'd']})
+    comparisons = pd.DataFrame({
+        'block_id': [1, 1, 1, 1],
+        'row1': [0, 0, 1, 2],
+        'row2': [1, 2, 2, 3],
+        'name_similarity': [0.6, 0.5, 0.5, 0.2],
+        'city_similarity': [0.6, 0.5, 0.5, 0.2],
+    })
+    expected = Classifier(blocks, comparisons).threshold_sweep()
+
+    for method, kwargs in [('threshold_based', {'thresholds': {'match': 0.5}}),
+                           ('weighted', {'thresholds': {'match': 0.5},
+                                         'weights': {'name_similarity': 0.5, 'city_similarity': 0.5}})]:
+        classifier = Classifier(blocks, comparisons)
+        classifier.classify_matches(method=method, **kwargs)
+        saved = pd.DataFrame(classifier.dataframe_to_jsonb())
+        sweep = Classifier(blocks, saved).threshold_sweep()
+        assert sweep['threshold'].tolist() == pytest.approx([0.6, 0.5, 0.2])
+        assert sweep.equals(expected)
+
+def test_ClassifierPrunedPairsOnlyThresholdBased():
+    blocks = pd.DataFrame({'ID': [0, 1, 2], 'a': ['a', 'a', 'b']})
+    comparisons = pd.DataFrame({
+        'block_id': [1, 1, 1],
+        'row1': [0, 0, 1],
+        'row2': [1, 2, 2],
+        'a_similarity': [1.0, 0.9, 0.1],
+        'b_similarity': [1.0, 0.8, float('nan')],
+        'pruned': [False, False, True],
+        'prune_threshold': [0.5, 0.5, 0.5],
+    })
+    classifier = Classifier(blocks, comparisons)
+    with pytest.raises(ValueError):
+        classifier.classify_matches(method='weighted', thresholds={'match': 0.5},
+                                    weights={'a_similarity': 0.5, 'b_similarity': 0.5})
+    with pytest.raises(ValueError):
+        classifier.classify_matches(method='cost_based', costs={}, probabilities={})
+    with pytest.raises(ValueError):
+        classifier.threshold_sweep(weights={'a_similarity': 1.0})
@@ -1,6 +1,8 @@
 import pytest
+import numpy as np
 import pandas as pd
-from ..Comparison import Comparison
+from ..Classifier import Classifier
+from ..Comparison import Comparison, BatchComparator
 
 @pytest.fixture
 def dummy_data_frame():
@@ -35,4 +37,112 @@ def test_ComparisonQgramSimilar(dummy_data_frame):
     assert 0 < Comparison(dummy_data_frame).qgram_similarity("canada", "banana") < 1
 
 def test_ComparisonQgramDifferent(dummy_data_frame):
-    assert Comparison(dummy_data_frame).qgram_similarity("canada", "fstuew") == 0
\ No newline at end of file
+    assert Comparison(dummy_data_frame).qgram_similarity("canada", "fstuew") == 0
+
+def test_ComparisonCompareWithinBlocks():
+    data = pd.DataFrame({
+        'ID': [0, 1, 2, 3],
+        'block_id': [2, 1, 2, 1],
+        'col1': ['canada', 'block', 'canada', 'cube'],
+    })
+    comparison = Comparison(data)
+    result = comparison.compare_within_blocks({'col1': comparison.levenshtein_similarity})
+    assert list(result.columns) == ['block_id', 'row1', 'row2', 'col1_similarity']
+    assert result[['block_id', 'row1', 'row2']].values.tolist() == [[1, 1, 3], [2, 0, 2]]
+    assert result['col1_similarity'].tolist() == [0.0, 1.0]
+
+
+def test_ComparisonBatchMatchesScalar():
+    data = pd.DataFrame({
+        'ID': [0, 1, 2, 3, 4],
+        'block_id': [1, 1, 1, 1, 1],
+        'col1': ['canada', 'banana', None, '', 'fstuew'],
+    })
+    comparison = Comparison(data)
+    for scalar, batch in [(comparison.levenshtein_similarity, comparison.levenshtein_similarity_batch),
+                          (comparison.jaro_winkler_similarity, comparison.jaro_winkler_similarity_batch)]:
+        expected = comparison.compare_within_blocks({'col1': scalar})
+        result = comparison.compare_within_blocks({'col1': BatchComparator(batch, workers=2)})
+        assert result['col1_similarity'].tolist() == expected['col1_similarity'].tolist()
+
+def test_ComparisonQgramBatchMatchesScalar():
+    data = pd.DataFrame({
+        'ID': [0, 1, 2, 3, 4],
+        'block_id': [1, 1, 1, 1, 1],
+        'col1': ['canada', 'banana', 'anaconda', None, 'ca'],
+    })
+    comparison = Comparison(data)
+    expected = comparison.compare_within_blocks({'col1': lambda str1, str2: comparison.qgram_similarity(str1, str2, q=2)})
+    result = comparison.compare_within_blocks({'col1': BatchComparator(comparison.qgram_similarity_batch, q=2)})
+    assert result['col1_similarity'].tolist() == expected['col1_similarity'].tolist()
+
+def test_ComparisonProcessPoolMatchesSerial():
+    data = pd.DataFrame({
+        'ID': list(range(12)),
+        'block_id': [1] * 8 + [2] * 4,
+        'col1': ['canada', 'banana', None, '', 'kanada', 'zażółć', 'canada', 'anaconda', 'a', 'b', 'ab', 'ba'],
+    })
+    comparison = Comparison(data)
+    column_algorithms = {'col1': BatchComparator(comparison.levenshtein_similarity_batch)}
+    expected = comparison.compare_within_blocks(column_algorithms)
+    result = comparison.compare_within_blocks(column_algorithms, processes=2, chunk_size=5)
+    assert result.equals(expected)
+
+def test_ComparisonPruningKeepsPairsAboveThreshold():
+    data = pd.DataFrame({
+        'ID': [0, 1, 2, 3],
+        'block_id': [1, 1, 1, 1],
+        'col1': ['canada', 'canada', 'fstuew', 'kanada'],
+        'col2': ['block', 'block', 'cube', 'block'],
+    })
+    comparison = Comparison(data)
+    column_algorithms = {
+        'col1': BatchComparator(comparison.levenshtein_similarity_batch),
+        'col2': BatchComparator(comparison.levenshtein_similarity_batch),
+    }
+    full = comparison.compare_within_blocks(column_algorithms)
+    pruned = comparison.compare_within_blocks(column_algorithms, prune_threshold=0.8)
+    # Only pairs that cannot reach 0.8 even with col2 at 1.0 skip col2.
+    assert pruned['pruned'].tolist() == ((full['col1_similarity'] + 1) / 2 < 0.8).tolist()
+    assert pruned.loc[pruned['pruned'], 'col2_similarity'].isna().all()
+    kept = ~pruned['pruned']
+    assert pruned.loc[kept, 'col1_similarity'].tolist() == full.loc[kept, 'col1_similarity'].tolist()
+    assert pruned.loc[kept, 'col2_similarity'].tolist() == full.loc[kept, 'col2_similarity'].tolist()
+
+def test_ComparisonPruningBoundsThePlainAverage():
+    data = pd.DataFrame({'ID': [0, 1], 'block_id': [1, 1], 'a': ['abc', 'xyz'], 'b': ['same', 'same']})
+    comparison = Comparison(data)
+    column_algorithms = {
+        'a': BatchComparator(comparison.levenshtein_similarity_batch),
+        'b': BatchComparator(comparison.levenshtein_similarity_batch),
+    }
+    pruned = comparison.compare_within_blocks(column_algorithms, prune_threshold=0.5)
+    # a scores 0.0 and b 1.0: the average 0.5 reaches the threshold.
+    assert pruned['pruned'].tolist() == [False]
+    assert pruned['prune_threshold'].tolist() == [0.5]
+    result = Classifier(data, pruned).classify_matches(thresholds={'match': 0.5})
+    assert result['classification'].tolist() == ['Match']
+
+def test_ComparisonPruningNeverChangesLabels():
+    rng = np.random.default_rng(0)
+    words = ['canada', 'kanada', 'canda', 'banana', 'block', 'blok', 'cube', None]
+    data = pd.DataFrame({
+        'ID': range(40),
+        'block_id': rng.integers(1, 4, 40),
+        'col1': rng.choice(words, 40),
+        'col2': rng.choice(words, 40),
+        'col3': rng.choice(words, 40),
+    })
+    comparison = Comparison(data)
+    column_algorithms = {
+        col: BatchComparator(comparison.levenshtein_similarity_batch) for col in ('col1', 'col2', 'col3')
+    }
+    full = comparison.compare_within_blocks(column_algorithms)
+    for threshold in (0.5, 0.7, 0.9):
+        pruned = comparison.compare_within_blocks(column_algorithms, prune_threshold=threshold)
+        assert pruned['pruned'].any()
+        for options in ({'thresholds': {'match': threshold}},
+                        {'thresholds': {'match': threshold + 0.05, 'not_match': threshold}, 'possible_match': True}):
+            expected = Classifier(data, full).classify_matches(**options)['classification']
+            result = Classifier(data, pruned).classify_matches(**options)['classification']
+            assert result.tolist() == expected.tolist()
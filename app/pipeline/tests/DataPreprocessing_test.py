@@ -36,4 +36,22 @@ def test_PreprocessingDropDuplicates3(duplicates_data_frame):
     preprocessing.drop_duplicates()
     result = preprocessing.get_processed_data()
     expected_output = pd.DataFrame({'col1': ['data', 'data', 'other'], 'col2': ['data', 'other', 'data'], 'col3': ['data', 'other', 'data']})
-    assert result.equals(expected_output)
\ No newline at end of file
+    assert result.equals(expected_output)
+def test_PreprocessingDropDuplicatesWithinSource():
+    data = pd.DataFrame({
+        'ID': [1, 2, 3],
+        'name': ['anna', 'anna', 'anna'],
+        'source': ['web', 'shop', 'web'],
+        '__source__': ['master', 'linked', 'master'],
+        '__source_id__': [1, 1, 2],
+    })
+    preprocessing = DataPreprocessing(data, source_column='__source__')
+    preprocessing.select_columns(['all'])
+    preprocessing.drop_duplicates()
+    assert preprocessing.columns == ['name', 'source']
+    assert preprocessing.get_processed_data()['ID'].tolist() == [1, 2]
+
+    preprocessing = DataPreprocessing(data.drop(columns=['__source__', '__source_id__']))
+    preprocessing.select_columns(['all'])
+    preprocessing.drop_duplicates()
+    assert preprocessing.get_processed_data()['ID'].tolist() == [1, 2]
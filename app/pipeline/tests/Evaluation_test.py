@@ -1,3 +1,63 @@
 import pytest
 import pandas as pd
-from ..Evaluation import Evaluation
\ No newline at end of file
+from ..CandidatePairs import SOURCE_COLUMN, SOURCE_ID_COLUMN
+from ..Evaluation import Evaluation
+
+@pytest.fixture
+def linkage_data():
+    source_data = pd.DataFrame({
+        'ID': [1, 2, 3, 4],
+        'name': ['smith', 'jones', 'smyth', 'brown'],
+        SOURCE_COLUMN: ['master', 'master', 'linked', 'linked'],
+        SOURCE_ID_COLUMN: ['a', 'b', 'x', 'y'],
+    })
+    classified_data = pd.DataFrame({
+        'row1': [3, 1, 2],
+        'row2': [1, 4, 4],
+        'classification': ['Match', 'Non-Match', 'Possible Match'],
+    })
+    return source_data, classified_data
+
+def test_EvaluationLinkageLinks(linkage_data):
+    links = Evaluation(*linkage_data, source_column=SOURCE_COLUMN).get_deduplicated_data()
+    assert links.to_dict(orient='records') == [
+        {'link_id': 1, 'master_ID': 'a', 'linked_ID': 'x', 'master_name': 'smith', 'linked_name': 'smyth'},
+    ]
+
+def test_EvaluationLinkageMatchesAndStatistics(linkage_data):
+    evaluation = Evaluation(*linkage_data, source_column=SOURCE_COLUMN)
+    matches = evaluation.show_matches_side_by_side()
+    assert matches['link_id'].tolist() == [1, 1]
+    assert matches[SOURCE_COLUMN].tolist() == ['master', 'linked']
+    statistics = evaluation.get_statistics().iloc[0]
+    assert statistics['Detected links'] == 1
+    assert statistics['Match percentage'] == 50.0
+
+def test_EvaluationSourceFieldIsNotLinkage(linkage_data):
+    source_data, classified_data = linkage_data
+    source_data = source_data.rename(columns={SOURCE_COLUMN: 'source'}).drop(columns=SOURCE_ID_COLUMN)
+    deduplicated = Evaluation(source_data, classified_data).get_deduplicated_data()
+    assert deduplicated['ID'].tolist() == [1, 2, 4]
+
+@pytest.fixture
+def chained_matches():
+    source_data = pd.DataFrame({
+        'ID': [10, 11, 12, 13, 14, 15],
+        'name': ['anna', 'ana', 'anne', 'bob', 'rob', 'zed'],
+    })
+    classified_data = pd.DataFrame({
+        'row1': [10, 12, 13, 10],
+        'row2': [11, 11, 14, 15],
+        'classification': ['Match', 'Match', 'Match', 'Non-Match'],
+    })
+    return source_data, classified_data
+
+def test_EvaluationClustersTransitiveMatches(chained_matches):
+    deduplicated = Evaluation(*chained_matches).get_deduplicated_data()
+    assert deduplicated['ID'].tolist() == [10, 13, 15]
+
+def test_EvaluationOneGroupPerCluster(chained_matches):
+    matches = Evaluation(*chained_matches).show_matches_side_by_side()
+    assert matches['dedup_id'].tolist() == [1, 1, 1, 2, 2]
+    assert matches['ID'].tolist() == [10, 11, 12, 13, 14]
+    assert matches['dropped'].tolist() == ['NO', 'YES', 'YES', 'NO', 'YES']
@@ -0,0 +1,134 @@
+import pytest
+import pandas as pd
+from ..BlockBuilding import BlockBuilding
+from ..Classifier import Classifier
+from ..Comparison import Comparison, BatchComparator
+from ..RecordLookup import CandidateIndex, RecordLookup
+
+@pytest.fixture
+def people():
+    return pd.DataFrame({
+        'ID': [1, 2, 3, 4, 5],
+        'first': ['anna', 'ana', 'john', 'jon', 'mary'],
+        'last': ['smith', 'smyth', 'doe', 'doe', 'jones'],
+    })
+
+def test_CandidateIndexStandardBlockingMatchesBlocks(people):
+    candidateIndex = CandidateIndex(people, 'standardBlocking', columns=['last'])
+    blocks = BlockBuilding(people, 'standardBlocking')
+    blocks.build_blocks(['last'])
+    query = pd.DataFrame([{'ID': 6, 'first': 'jane', 'last': 'smithe'}])
+    same_key = blocks.get_blocks()['BKV'] == 'S530'
+    assert candidateIndex.candidates(query).tolist() == blocks.get_blocks().index[same_key].tolist()
+
+def test_CandidateIndexMultiPassUnion(people):
+    candidateIndex = CandidateIndex(people, 'multiPass', passes=[
+        {'method': 'standardBlocking', 'columns': ['last']},
+        {'method': 'standardBlocking', 'columns': ['first']},
+    ])
+    query = pd.DataFrame([{'ID': 6, 'first': 'jon', 'last': 'smith'}])
+    assert candidateIndex.candidates(query).tolist() == [0, 1, 2, 3]
+
+def test_CandidateIndexSetSimilarityJoinMatchesPairs(people):
+    candidateIndex = CandidateIndex(people, 'setSimilarityJoin', columns=['first', 'last'], match_threshold=0.4)
+    blocks = BlockBuilding(people, 'setSimilarityJoin')
+    blocks.build_blocks(['first', 'last'], match_threshold=0.4)
+    pairs = blocks.get_candidate_pairs()
+    for row in range(len(people)):
+        partners = sorted(set(pairs.row2[pairs.row1 == row]) | set(pairs.row1[pairs.row2 == row]) | {row})
+        assert candidateIndex.candidates(people.iloc[[row]]).tolist() == partners
+
+def test_CandidateIndexKnnBlockingNearest(people):
+    candidateIndex = CandidateIndex(people, 'knnBlocking', columns=['first', 'last'], k=2)
+    query = pd.DataFrame([{'ID': 6, 'first': 'jonn', 'last': 'doe'}])
+    assert candidateIndex.candidates(query).tolist() == [2, 3]
+
+def test_CandidateIndexSuffixArrayMatchesPairs(people):
+    candidateIndex = CandidateIndex(people, 'suffixArrayBlocking', columns=['last'], min_suffix_length=3)
+    query = pd.DataFrame([{'ID': 6, 'first': 'jim', 'last': 'psmith'}])
+    assert candidateIndex.candidates(query).tolist() == [0]
+
+def test_RecordLookupRanksMatches(people):
+    recordLookup = RecordLookup(
+        people,
+        blocking={'method': 'standardBlocking', 'columns': ['last']},
+        column_algorithms={'first': BatchComparator(Comparison.jaro_winkler_similarity_batch)},
+        preprocessing={'lowercase': True},
+        classification={'method': 'threshold_based', 'thresholds': {'match': 0.9}},
+    )
+    matches = recordLookup.lookup({'first': 'ANNA', 'last': 'Smith'}, top_n=1)
+    assert [(match['ID'], match['score'], match['classification']) for match in matches] == [(1, 1.0, 'Match')]
+    assert matches[0]['record'] == {'ID': 1, 'first': 'anna', 'last': 'smith'}
+
+def test_RecordLookupNoCandidates(people):
+    recordLookup = RecordLookup(people, blocking={'method': 'standardBlocking', 'columns': ['last']},
+                                column_algorithms={'first': Comparison.levenshtein_similarity})
+    assert recordLookup.lookup({'first': 'zed', 'last': 'quinn'}) == []
+
+def _batch_state(method, **options):
+    matches = [(0.95, 0.9), (0.9, 1.0), (1.0, 0.85), (0.9, 0.95), (1.0, 1.0)]
+    non_matches = [(0.1, 0.2), (0.3, 0.1), (0.2, 0.4), (0.6, 0.1), (0.1, 0.6), (0.2, 0.2), (0.4, 0.3)] * 4
+    scores = matches + non_matches
+    comparisons = pd.DataFrame({
+        'block_id': 1,
+        'row1': 1,
+        'row2': 2,
+        'first_similarity': [first for first, _ in scores],
+        'last_similarity': [last for _, last in scores],
+    })
+    classifier = Classifier(pd.DataFrame({'ID': [1, 2]}), comparisons)
+    classifier.classify_matches(method=method, **options)
+    return classifier.fitted_state()
+
+@pytest.mark.parametrize('classification', [
+    {'method': 'threshold_based', 'thresholds': {'match': 0.9}},
+    {'method': 'cost_based',
+     'costs': {'non_match_true_match': 1, 'non_match_true_non_match': 0,
+               'match_true_match': 0, 'match_true_non_match': 1},
+     'probabilities': {'M': 0.5, 'U': 0.5}},
+    {'method': 'weighted', 'thresholds': {'match': 0.9},
+     'weights': {'first_similarity': 0.5, 'last_similarity': 0.5}},
+    {'method': 'weighted', 'thresholds': {'match': 0.9},
+     'weights': {'first_similarity': 0.5, 'last_similarity': 0.5},
+     'state': _batch_state('weighted', thresholds={'match': 0.9},
+                           weights={'first_similarity': 0.5, 'last_similarity': 0.5})},
+    {'method': 'fellegi_sunter', 'thresholds': {'match': 0.5},
+     'state': _batch_state('fellegi_sunter', levels=[0.5, 0.8])},
+])
+def test_RecordLookupExactDuplicateIsMatch(people, classification):
+    recordLookup = RecordLookup(
+        people,
+        blocking={'method': 'standardBlocking', 'columns': ['last']},
+        column_algorithms={'first': Comparison.levenshtein_similarity, 'last': Comparison.levenshtein_similarity},
+        classification=classification,
+    )
+    matches = recordLookup.lookup({'first': 'anna', 'last': 'smith'})
+    assert [match['ID'] for match in matches] == [1, 2]
+    assert matches[0]['classification'] == 'Match'
+
+    # A lone candidate leaves nothing to normalize or estimate over.
+    matches = recordLookup.lookup({'first': 'mary', 'last': 'jones'})
+    assert [(match['ID'], match['classification']) for match in matches] == [(5, 'Match')]
+
+def test_RecordLookupWeightedConstantBatchScores(people):
+    weights = {'first_similarity': 0.5, 'last_similarity': 0.5}
+    comparisons = pd.DataFrame({'block_id': 1, 'row1': [1, 1], 'row2': [2, 3],
+                                'first_similarity': 0.5, 'last_similarity': 0.5})
+    classifier = Classifier(pd.DataFrame({'ID': [1, 2, 3]}), comparisons)
+    classifier.classify_matches(method='weighted', thresholds={'match': 0.9}, weights=weights)
+    assert classifier.fitted_state() == {'min_similarity': 0.5, 'max_similarity': 0.5}
+
+    for state, label in [(classifier.fitted_state(), 'Non-Match'), ({}, 'Match')]:
+        recordLookup = RecordLookup(
+            people,
+            blocking={'method': 'standardBlocking', 'columns': ['last']},
+            column_algorithms={'first': Comparison.levenshtein_similarity, 'last': Comparison.levenshtein_similarity},
+            classification={'method': 'weighted', 'thresholds': {'match': 0.9}, 'weights': weights, 'state': state},
+        )
+        assert recordLookup.lookup({'first': 'anna', 'last': 'smith'})[0]['classification'] == label
+
+def test_RecordLookupFellegiSunterNeedsBatchState(people):
+    with pytest.raises(ValueError):
+        RecordLookup(people, blocking={'method': 'standardBlocking', 'columns': ['last']},
+                     column_algorithms={'first': Comparison.levenshtein_similarity},
+                     classification={'method': 'fellegi_sunter'})
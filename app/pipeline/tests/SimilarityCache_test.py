@@ -0,0 +1,47 @@
+import pytest
+import pandas as pd
+from ..Comparison import Comparison, BatchComparator
+from ..SimilarityCache import SimilarityCache
+
+
+@pytest.fixture
+def repeated_values_data_frame():
+    return pd.DataFrame({
+        'ID': [0, 1, 2, 3, 4, 5],
+        'block_id': [1, 1, 1, 1, 1, 1],
+        'col1': ['anderson', 'andersen', 'anderson', 'andersen', None, 'anderson'],
+    })
+
+def test_SimilarityCacheMatchesUncached(repeated_values_data_frame):
+    column_algorithms = {'col1': BatchComparator(Comparison.levenshtein_similarity_batch)}
+    expected = Comparison(repeated_values_data_frame, cache_size=0).compare_within_blocks(column_algorithms)
+    result = Comparison(repeated_values_data_frame).compare_within_blocks(column_algorithms)
+    assert result.equals(expected)
+
+def test_SimilarityCacheStatistics(repeated_values_data_frame):
+    comparison = Comparison(repeated_values_data_frame)
+    column_algorithms = {'col1': BatchComparator(comparison.levenshtein_similarity_batch)}
+    comparison.compare_within_blocks(column_algorithms)
+    first_run = comparison.get_cache_statistics()
+    comparison.compare_within_blocks(column_algorithms)
+    second_run = comparison.get_cache_statistics()
+    assert first_run['hits'] == 0 and first_run['identical'] == 2
+    assert second_run['hits'] == first_run['misses']
+    assert second_run['size'] == first_run['size']
+
+def test_SimilarityCacheSharedBetweenComparisons(repeated_values_data_frame):
+    cache = SimilarityCache(100)
+    column_algorithms = {'col1': BatchComparator(Comparison.levenshtein_similarity_batch)}
+    first = Comparison(repeated_values_data_frame, cache=cache)
+    first.compare_within_blocks(column_algorithms)
+    second = Comparison(repeated_values_data_frame, cache=cache)
+    second.compare_within_blocks(column_algorithms)
+    # Each comparison reports its own run; the second one only hits.
+    assert second.get_cache_statistics()['hits'] == first.get_cache_statistics()['misses']
+    assert second.get_cache_statistics()['misses'] == 0
+    assert SimilarityCache.shared(10) is SimilarityCache.shared(20)
+    assert SimilarityCache.shared().max_size == 100000
+
+def test_SimilarityCacheDisabled(repeated_values_data_frame):
+    with pytest.raises(ValueError):
+        Comparison(repeated_values_data_frame, cache_size=0).get_cache_statistics()
@@ -1,9 +1,11 @@
 from fastapi import APIRouter, UploadFile, File, Form, HTTPException, Depends
 from sqlalchemy.orm import Session
-from typing import List
+from typing import List, Dict, Any
 from common.dependencies import get_db, get_current_user
 import crud.project as _crud
+import crud.blocking_index as _crud_blocking_index
 import schemas.project as _schemas_project
+import schemas.blocking_index as _schemas_blocking_index
 import schemas.user as _schemas_user
 
 
@@ -64,6 +66,7 @@ async def update_project(
         project_id: int,
         title: str = Form(...),
         description: str = Form(None),
+        file: UploadFile = File(None),
         db: Session = Depends(get_db),
         current_user: _schemas_user = Depends(get_current_user)
 ):
@@ -85,6 +88,7 @@ async def update_project(
         db=db,
         project=project,
         project_dto=project_data,
+        file=file,
     )
 
 
@@ -106,4 +110,94 @@ async def delete_project(
     await _crud.delete_project(
         db=db,
         project=project,
-    )
\ No newline at end of file
+    )
+
+
+@router.put("/{project_id}/blocking-index", response_model=_schemas_blocking_index.BlockingIndex)
+async def build_blocking_index(
+        project_id: int,
+        blocking_index: _schemas_blocking_index.BlockingIndexCreate,
+        db: Session = Depends(get_db),
+        current_user: _schemas_user = Depends(get_current_user)
+):
+    project = await _crud.get_project_by_id(db=db, project_id=project_id)
+
+    if project is None:
+        raise HTTPException(status_code=404, detail="Project not found")
+
+    if project.user_id != current_user.id:
+        raise HTTPException(status_code=403,
+                            detail="Not enough permissions to access this project")
+
+    return await _crud_blocking_index.build_blocking_index(
+        db=db,
+        project=project,
+        columns=blocking_index.columns,
+    )
+
+
+@router.post("/{project_id}/blocking-index/records", status_code=200)
+async def add_indexed_records(
+        project_id: int,
+        records: List[Dict[str, Any]],
+        db: Session = Depends(get_db),
+        current_user: _schemas_user = Depends(get_current_user)
+):
+    project = await _crud.get_project_by_id(db=db, project_id=project_id)
+
+    if project is None:
+        raise HTTPException(status_code=404, detail="Project not found")
+
+    if project.user_id != current_user.id:
+        raise HTTPException(status_code=403,
+                            detail="Not enough permissions to access this project")
+
+    return await _crud_blocking_index.add_records(
+        db=db,
+        project=project,
+        records=records,
+    )
+
+
+@router.put("/{project_id}/linked-dataset", response_model=_schemas_project.LinkedDataset)
+async def set_linked_dataset(
+        project_id: int,
+        file: UploadFile = File(...),
+        db: Session = Depends(get_db),
+        current_user: _schemas_user = Depends(get_current_user)
+):
+    project = await _crud.get_project_by_id(db=db, project_id=project_id)
+
+    if project is None:
+        raise HTTPException(status_code=404, detail="Project not found")
+
+    if project.user_id != current_user.id:
+        raise HTTPException(status_code=403,
+                            detail="Not enough permissions to access this project")
+
+    return await _crud.set_linked_dataset(
+        db=db,
+        project=project,
+        file=file,
+    )
+
+
+@router.delete("/{project_id}/linked-dataset", status_code=200)
+async def delete_linked_dataset(
+        project_id: int,
+        db: Session = Depends(get_db),
+        current_user: _schemas_user = Depends(get_current_user)
+):
+    project = await _crud.get_project_by_id(db=db, project_id=project_id)
+
+    if project is None:
+        raise HTTPException(status_code=404, detail="Project not found")
+
+    if project.user_id != current_user.id:
+        raise HTTPException(status_code=403,
+                            detail="Not enough permissions to access this project")
+
+    await _crud.delete_linked_dataset(
+        db=db,
+        project=project,
+    )
@@ -51,3 +51,16 @@ async def get_step(
         step_name=step_name
     )
 
+
+@router.post("/{workflow_id}/dry-run", status_code=200)
+async def dry_run_blocking(
+        workflow_id: int,
+        dry_run: _schemas.BlockingDryRun,
+        db: Session = Depends(get_db),
+        current_user: _schemas_user = Depends(get_current_user),
+):
+    return await _crud.dry_run_blocking(
+        db,
+        dry_run=dry_run,
+        workflow_id=workflow_id
+    )
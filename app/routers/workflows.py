@@ -4,6 +4,7 @@ import schemas.user as _schemas_user
 import schemas.statistics as _schemas_statistics
 import schemas.workflow as _schemas
 import crud.workflow as _crud
+import crud.lookup as _crud_lookup
 from common.dependencies import get_db, get_current_user
 from typing import Dict, Any, List
 from crud.workflow import get_workflow_by_id, get_statistics
@@ -219,4 +220,35 @@ async def set_file(
         db=db,
         file=file,
         user_id=current_user.id
-    )
\ No newline at end of file
+    )
+
+
+@router.post("/{workflow_id}/lookup", status_code=200)
+async def lookup_record(
+        workflow_id: int,
+        lookup: _schemas.RecordLookup,
+        db: Session = Depends(get_db),
+        current_user: _schemas_user = Depends(get_current_user)
+):
+    return await _crud_lookup.lookup_record(
+        db=db,
+        workflow_id=workflow_id,
+        user_id=current_user.id,
+        record=lookup.record,
+        top_n=lookup.top_n
+    )
+
+
+@router.post("/{workflow_id}/threshold-sweep", status_code=200)
+async def get_threshold_sweep(
+        workflow_id: int,
+        sweep: _schemas.ThresholdSweep,
+        db: Session = Depends(get_db),
+        current_user: _schemas_user = Depends(get_current_user)
+):
+    return await _crud.get_threshold_sweep(
+        workflow_id=workflow_id,
+        db=db,
+        user_id=current_user.id,
+        sweep=sweep
+    )
@@ -0,0 +1,19 @@
+import datetime as _dt
+from pydantic import BaseModel
+from typing import List
+
+
+class BlockingIndexCreate(BaseModel):
+    columns: List[str]
+
+
+class BlockingIndex(BaseModel):
+    id: int
+    project_id: int
+    columns: List[str]
+    num_records: int
+    date_created: _dt.datetime
+    date_updated: _dt.datetime
+
+    class Config:
+        from_attributes = True
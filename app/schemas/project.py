@@ -36,3 +36,13 @@ class Project(_BaseProject):
 
     class Config:
         from_attributes = True
+
+
+class LinkedDataset(_pydantic.BaseModel):
+    id: int
+    project_id: int
+    filename: str
+    date_created: _dt.datetime
+
+    class Config:
+        from_attributes = True
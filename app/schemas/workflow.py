@@ -1,4 +1,4 @@
-from typing import Optional
+from typing import Optional, Dict, Any, List
 from pydantic import BaseModel
 import datetime as _dt
 
@@ -15,3 +15,13 @@ class WorkflowBase(BaseModel):
 
 class Workflow(WorkflowBase):
     filename: Optional[str]
+
+
+class RecordLookup(BaseModel):
+    record: Dict[str, Any]
+    top_n: int = 10
+
+
+class ThresholdSweep(BaseModel):
+    weights: Optional[Dict[str, float]] = None
+    true_matches: Optional[List[List[Any]]] = None
@@ -1,7 +1,13 @@
 from models.enums.step_name import StepName
+from typing import Optional
 from pydantic import BaseModel, Json
 
 
 class WorkflowStep(BaseModel):
     step: StepName
-    parameters: Json
\ No newline at end of file
+    parameters: Json
+
+class BlockingDryRun(BaseModel):
+    blocking: Json
+    comparison: Optional[Json] = None
+    sample_size: int = 1000
@@ -4,24 +4,35 @@ from .base_strategy import BaseStrategy
 class ComparisonStrategy(BaseStrategy):
     def execute(self):
         from pipeline.Comparison import Comparison
+        from pipeline.SimilarityCache import SimilarityCache
 
         selected_algorithms = self.parameters.get("selectedAlgorithms", {})
         q_value = self.parameters.get("qValue", 2)
+        workers = self.parameters.get("workers", 1)
+        processes = self.parameters.get("processes")
 
-        comparison = Comparison(self.dataframe)
+        cache_size = self.parameters.get("cacheSize", 100000)
+        comparison = Comparison(self.dataframe, cache=SimilarityCache.shared(cache_size)) if cache_size \
+            else Comparison(self.dataframe, cache_size=0)
         column_algorithms = {
-            column: self._get_algorithm(algo, comparison, q_value)
+            column: self._get_algorithm(algo, comparison, q_value, workers)
             for column, algo in selected_algorithms.items()
         }
 
-        return comparison.compare_within_blocks(column_algorithms)
+        return comparison.compare_within_blocks(
+            column_algorithms,
+            processes=processes,
+            prune_threshold=self.parameters.get("pruneThreshold")
+        )
+
+    def _get_algorithm(self, algo, comparison, q_value, workers):
+        from pipeline.Comparison import BatchComparator
 
-    def _get_algorithm(self, algo, comparison, q_value):
         if algo == "Q-gram":
-            return lambda str1, str2: comparison.qgram_similarity(str1, str2, q=q_value)
+            return BatchComparator(comparison.qgram_similarity_batch, q=q_value)
         elif algo == "Levenshtein":
-            return comparison.levenshtein_similarity
+            return BatchComparator(comparison.levenshtein_similarity_batch, workers=workers)
         elif algo == "Jaro-Winkler":
-            return comparison.jaro_winkler_similarity
+            return BatchComparator(comparison.jaro_winkler_similarity_batch, workers=workers)
         else:
             raise ValueError(f"Unsupported algorithm: {algo}")
\ No newline at end of file